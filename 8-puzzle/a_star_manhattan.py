@@ -1,30 +1,134 @@
 import os
 import sys
+import json
+import mmap
+import hashlib
+import argparse
+import multiprocessing
+from collections import deque
+from itertools import islice
 from heapq import heappush, heappop
 from copy import deepcopy
+from time import perf_counter
 
 # This program solves then 8-puzzle problem using an A* GRAPH SEARCH
 # algorithm, using the total manhattan distance from the current state
-# to the goal state as a heuristic
+# to the goal state as a heuristic. Boards of any N x N size are accepted,
+# and an IDA* mode is available for boards too large for A*. The misplaced
+# tiles and pattern database heuristics can be picked instead
 
 class Puzzle(object):
     goal_state = None
-    def __init__(self, init_state, goal_state):
-        Puzzle.goal_state = Puzzle.State(goal_state, calculate_eval_value = False)
-        self.init_state = Puzzle.State(init_state, calculate_eval_value = False)
+    heuristic = None
+    heuristic_key = None
+    move_table = None
+    move_table_key = None
+    size = 3
+    bits = 4
+    # Where PatternDatabase and MoveTable keep the tables they build
+    tables_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables")
+    def __init__(self, init_state, goal_state, packed = True, algorithm = "astar", heuristic = "manhattan", use_move_table = True,
+            collect_stats = False):
+        # States evaluate themselves on creation, so the heuristic must be
+        # ready before any state is created
+        Puzzle.prepare(goal_state, heuristic)
 
+        # packed = True uses the compact integer-encoded PackedState,
+        # packed = False falls back to the nested list State
+        state_class = Puzzle.PackedState if packed else Puzzle.State
+        Puzzle.goal_state = state_class.from_values(goal_state)
+        self.init_state = state_class.from_values(init_state)
+
+        # "astar" runs the A* graph search, "idastar" the linear memory IDA*
+        # and "bidirectional" a breadth first search from both ends
+        self.algorithm = algorithm
+        # Whether solve() may answer A* without stats from a prebuilt MoveTable
+        self.use_move_table = use_move_table
         self.actions = list()
+        self.expanded = 0
+        self.meeting_depth = None
         self.solvable = False
-        self.frontier = Puzzle.PriorityQueue()
         self.visited = set()
 
+        # collect_stats = True fills self.stats while solving, at the cost of
+        # timing every heuristic evaluation, expansion and heap operation
+        self.stats = Puzzle.SearchStats(algorithm, heuristic) if collect_stats else None
+        self.frontier = Puzzle.TimedPriorityQueue(self.stats) if collect_stats else Puzzle.PriorityQueue()
+
+    def solve(self):
+        if self.stats is None:
+            return self.search()
+
+        # The heuristic is shared by all puzzles, so it is only swapped for a
+        # timed one while this puzzle is being solved
+        heuristic = Puzzle.heuristic
+        Puzzle.heuristic = Puzzle.TimedHeuristic(heuristic, self.stats)
+        start = perf_counter()
+        try:
+            actions = self.search()
+        finally:
+            Puzzle.heuristic = heuristic
+        self.stats.total_seconds = perf_counter() - start
+        self.stats.expanded = self.expanded
+        self.stats.solution_depth = len(self.actions) if self.solvable else None
+        return actions
+
+    def search(self):
+        # Half of all boards can never reach the goal, so reject those before
+        # searching instead of after exhausting every reachable state
+        if not self.is_solvable():
+            return ["UNSOLVABLE"]
+
+        # The table only stands in for the default A* search, since it neither
+        # expands nodes nor meets in the middle, and would leave stats empty
+        if self.use_move_table and self.algorithm == "astar" and self.stats is None and Puzzle.move_table is not None:
+            self.solvable = True
+            self.actions = Puzzle.move_table.walk([self.init_state.tile_at(idx) for idx in range(Puzzle.size * Puzzle.size)])
+            return self.actions
+
+        if self.algorithm == "idastar":
+            return self.solve_ida_star()
+        if self.algorithm == "bidirectional":
+            # The breadth first search never reads the heuristic, so the states
+            # it creates are not evaluated
+            heuristic = Puzzle.heuristic
+            Puzzle.heuristic = Puzzle.ZeroHeuristic()
+            try:
+                return self.solve_bidirectional()
+            finally:
+                Puzzle.heuristic = heuristic
+        return self.solve_a_star()
+
+    # Children of a state, counted and timed when collecting stats
+    def expand(self, state):
+        self.expanded += 1
+        if self.stats is None:
+            return state.calculate_moves()
+
+        start = perf_counter()
+        possible_states = state.calculate_moves()
+        self.stats.successor_seconds += perf_counter() - start
+        self.stats.generated += len(possible_states)
+        self.stats.peak_depth = max(self.stats.peak_depth, state.moves + 1)
+        return possible_states
+
     # -----------------------------------------------------------------------------------------
     # A* GRAPH SEARCH Algorithm
-    def solve(self):
+    # best_moves holds the fewest moves any pushed copy of a state was reached
+    # in. Children that do not improve on it are never pushed, and copies that
+    # were improved upon after being pushed are skipped when polled, so every
+    # state is expanded at most once
+    def solve_a_star(self):
         self.frontier.add(self.init_state)
+        best_moves = {self.init_state: 0}
 
         while not self.frontier.is_empty():
             current_state = self.frontier.poll()
+            if current_state in self.visited or current_state.moves > best_moves[current_state]:
+                if self.stats is not None:
+                    self.stats.stale += 1
+                continue
+
             if current_state.is_goal_state():
                 self.solvable = True
                 while current_state.parent is not None:
@@ -32,40 +136,518 @@ class Puzzle(object):
                     current_state = current_state.parent
                 break
             else:
-                possible_states = current_state.calculate_moves()
+                possible_states = self.expand(current_state)
                 for state in possible_states:
-                    if state not in self.visited:
+                    if state not in self.visited and state.moves < best_moves.get(state, float("inf")):
+                        best_moves[state] = state.moves
                         self.frontier.add(state)
+                    elif self.stats is not None:
+                        self.stats.duplicates += 1
                 self.visited.add(current_state)
         self.actions.reverse()
         
+        if self.stats is not None:
+            self.stats.peak_frontier = self.frontier.max_size
+            self.stats.peak_visited = len(self.visited)
+
         # Return Values
         if not self.solvable:
             return ["UNSOLVABLE"]
         return self.actions
 
+    # -----------------------------------------------------------------------------------------
+    # IDA* Algorithm
+    # Depth first search that prunes every state whose evaluation value exceeds
+    # the bound, then retries with the smallest evaluation value that was
+    # pruned. Only the current path is kept, so memory grows with the solution
+    # depth instead of the number of visited states. The search only ends once
+    # the goal is found, so solve() rejects unsolvable boards beforehand
+    def solve_ida_star(self):
+        path = [self.init_state]
+        bound = self.init_state.evaluation_value
+        while True:
+            result = self.ida_star_search(path, bound)
+            if result is True:
+                self.solvable = True
+                break
+            if result == float("inf"):
+                break
+            bound = result
+
+        # Only the path is kept, so it is both the frontier and the memory used
+        if self.stats is not None:
+            self.stats.peak_frontier = self.stats.peak_visited = self.stats.peak_depth
+
+        # Return Values
+        if not self.solvable:
+            return ["UNSOLVABLE"]
+        self.actions = [state.move_taken for state in path[1:]]
+        return self.actions
+
+    # Returns True once the goal is at the end of path, otherwise the smallest
+    # evaluation value found above the bound
+    def ida_star_search(self, path, bound):
+        current_state = path[-1]
+        if current_state.evaluation_value > bound:
+            return current_state.evaluation_value
+        if current_state.is_goal_state():
+            return True
+
+        minimum = float("inf")
+        for state in self.expand(current_state):
+            # Never undo the move that was just made
+            if current_state.parent is not None and state == current_state.parent:
+                if self.stats is not None:
+                    self.stats.duplicates += 1
+                continue
+            path.append(state)
+            result = self.ida_star_search(path, bound)
+            if result is True:
+                return True
+            minimum = min(minimum, result)
+            path.pop()
+        return minimum
+
+    # -----------------------------------------------------------------------------------------
+    # Bidirectional Search
+    # Breadth first search from the initial state and backwards from the goal
+    # state, always growing the side with the smaller frontier by one whole
+    # layer. Each side only has to reach about half the solution depth, so far
+    # fewer states are generated than by a search from one end. The first layer
+    # that touches the other side contains a shortest path
+    def solve_bidirectional(self):
+        forward = {self.init_state: self.init_state}
+        backward = {Puzzle.goal_state: Puzzle.goal_state}
+        forward_layer = [self.init_state]
+        backward_layer = [Puzzle.goal_state]
+
+        meeting = (self.init_state, Puzzle.goal_state) if self.init_state in backward else None
+        while meeting is None and forward_layer and backward_layer:
+            if self.stats is not None:
+                self.stats.peak_frontier = max(self.stats.peak_frontier, len(forward_layer) + len(backward_layer))
+            if len(forward_layer) <= len(backward_layer):
+                forward_layer, meeting = self.expand_layer(forward_layer, forward, backward)
+            else:
+                backward_layer, meeting = self.expand_layer(backward_layer, backward, forward)
+                if meeting is not None:
+                    meeting = (meeting[1], meeting[0])
+
+        if self.stats is not None:
+            self.stats.peak_visited = len(forward) + len(backward)
+
+        # Return Values
+        if meeting is None:
+            return ["UNSOLVABLE"]
+        self.solvable = True
+        forward_state, backward_state = meeting
+        self.meeting_depth = forward_state.moves
+
+        # The forward half is read back from the meeting state to the initial
+        # state. The backward half was searched from the goal, so each of its
+        # moves is undone by the opposite move
+        current_state = forward_state
+        while current_state.parent is not None:
+            self.actions.append(current_state.move_taken)
+            current_state = current_state.parent
+        self.actions.reverse()
+
+        opposite = {"UP": "DOWN", "DOWN": "UP", "LEFT": "RIGHT", "RIGHT": "LEFT"}
+        current_state = backward_state
+        while current_state.parent is not None:
+            self.actions.append(opposite[current_state.move_taken])
+            current_state = current_state.parent
+        return self.actions
+
+    # Expands every state of a layer, recording new states in seen. Returns the
+    # next layer and the (state, matching state of the other side) pair with
+    # the fewest total moves, if any new state was already seen by other
+    def expand_layer(self, layer, seen, other):
+        next_layer = list()
+        meeting = None
+        for current_state in layer:
+            for state in self.expand(current_state):
+                if state in seen:
+                    if self.stats is not None:
+                        self.stats.duplicates += 1
+                    continue
+                seen[state] = state
+                next_layer.append(state)
+                if state in other:
+                    other_state = other[state]
+                    if meeting is None or state.moves + other_state.moves < meeting[0].moves + meeting[1].moves:
+                        meeting = (state, other_state)
+        return next_layer, meeting
+
+    # -----------------------------------------------------------------------------------------
+    # Solvability Check
+    # Sliding a tile along a row never changes the order of the tiles. Sliding
+    # it along a column jumps it over size - 1 other tiles, which flips the
+    # parity of the number of inversions when the width is even, while the '0'
+    # changes row. So the parity of the inversions, plus the row of the '0'
+    # for even widths, never changes, and a board is solvable exactly when
+    # its parity matches the goal state's
+    def is_solvable(self):
+        return Puzzle.parity(self.init_state) == Puzzle.parity(Puzzle.goal_state)
+
+    @staticmethod
+    def parity(state):
+        flattened_values = [state.tile_at(idx) for idx in range(Puzzle.size * Puzzle.size)]
+        zero_row = int(flattened_values.index(0) / Puzzle.size)
+        tiles = [tile for tile in flattened_values if tile != 0]
+
+        inversions = 0
+        for i in range(len(tiles)):
+            for j in range(i + 1, len(tiles)):
+                if tiles[i] > tiles[j]:
+                    inversions += 1
+        if Puzzle.size % 2 == 0:
+            inversions += zero_row
+        return inversions % 2
+
+    # -----------------------------------------------------------------------------------------
+    # Heuristics
+    # Sets up the board width, the bits needed by PackedState to hold one tile
+    # (4 bits up to the 15-puzzle, 5 bits for the 24-puzzle), the heuristic and
+    # the move table, if one has been built. Tables are only reloaded when the
+    # goal state or heuristic changes, so puzzles solved one after another
+    # share them
+    @staticmethod
+    def prepare(goal_state, heuristic):
+        Puzzle.size = len(goal_state)
+        Puzzle.bits = max(4, (Puzzle.size * Puzzle.size - 1).bit_length())
+
+        heuristic_key = (heuristic, tuple(item for row in goal_state for item in row))
+        if Puzzle.heuristic_key != heuristic_key:
+            Puzzle.heuristic = Puzzle.build_heuristic(heuristic, goal_state)
+            Puzzle.heuristic_key = heuristic_key
+
+        move_table_key = heuristic_key[1]
+        if Puzzle.move_table_key != move_table_key:
+            Puzzle.move_table = Puzzle.MoveTable.load(goal_state, Puzzle.tables_directory)
+            Puzzle.move_table_key = move_table_key
+
+    # Short name for a goal state, used to tell apart the tables built for it
+    @staticmethod
+    def goal_digest(flattened_goal_state):
+        return hashlib.md5(" ".join(str(tile) for tile in flattened_goal_state).encode()).hexdigest()[:12]
+
+    @staticmethod
+    def save_table(path, table):
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Written under a temporary name so concurrent runs never map a
+        # partially written table
+        temporary_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temporary_path, "wb") as f:
+            f.write(table)
+        os.rename(temporary_path, path)
+
+    @staticmethod
+    def map_table(path):
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+    @staticmethod
+    def build_heuristic(heuristic, goal_state):
+        if heuristic == "manhattan":
+            return Puzzle.TileTable(Puzzle.build_manhattan_table(goal_state))
+        if heuristic == "misplaced":
+            return Puzzle.TileTable(Puzzle.build_misplaced_table(goal_state))
+        if heuristic == "pdb":
+            return Puzzle.PatternDatabase.load(goal_state, Puzzle.tables_directory)
+        raise ValueError("Unknown heuristic!")
+
+    # Manhattan distance of every tile from every index to its index in the
+    # goal state. The '0' is not a tile and contributes nothing
+    @staticmethod
+    def build_manhattan_table(goal_state):
+        flattened_goal_state = [item for row in goal_state for item in row]
+        table = [[0] * len(flattened_goal_state) for _ in flattened_goal_state]
+        for goal_state_idx, tile in enumerate(flattened_goal_state):
+            if tile == 0:
+                continue
+            (goal_state_row, goal_state_col) = int(goal_state_idx / Puzzle.size), goal_state_idx % Puzzle.size
+            for current_idx in range(len(flattened_goal_state)):
+                (current_row, current_col) = int(current_idx / Puzzle.size), current_idx % Puzzle.size
+                table[tile][current_idx] = abs(goal_state_row - current_row) + abs(goal_state_col - current_col)
+        return table
+
+    # Whether every tile is misplaced at every index, i.e. 1 everywhere but
+    # its index in the goal state. The '0' is not a tile and never counts
+    @staticmethod
+    def build_misplaced_table(goal_state):
+        flattened_goal_state = [item for row in goal_state for item in row]
+        table = [[0] * len(flattened_goal_state) for _ in flattened_goal_state]
+        for goal_state_idx, tile in enumerate(flattened_goal_state):
+            if tile == 0:
+                continue
+            for current_idx in range(len(flattened_goal_state)):
+                table[tile][current_idx] = 0 if current_idx == goal_state_idx else 1
+        return table
+
+    # Heuristic that sums a per-tile, per-index table, table[tile][idx] being
+    # the contribution of 'tile' when it sits at flattened index 'idx'
+    class TileTable(object):
+        def __init__(self, table):
+            self.table = table
+
+        def evaluate(self, state):
+            return sum(self.table[state.tile_at(idx)][idx] for idx in range(Puzzle.size * Puzzle.size))
+
+        # Only the tile swapped with the '0' changes its contribution, so a
+        # child's heuristic is its parent's adjusted by two table lookups
+        def update(self, heuristic, state, tile, from_idx, to_idx):
+            return heuristic - self.table[tile][from_idx] + self.table[tile][to_idx]
+
+    # Additive disjoint pattern databases. The tiles are split into groups, and
+    # for every placement of a group's tiles and the '0' the table holds the
+    # fewest moves of that group's tiles needed to reach the goal, moves of
+    # other tiles being free. No move is counted by two groups, so the sum over
+    # the groups never overestimates. Keeping the '0' in the placement also
+    # keeps the sum consistent, which A* needs to return optimal paths
+    # Each table is built once by a backward breadth first search from the goal
+    # state, saved with one byte per placement, and memory-mapped afterwards
+    class PatternDatabase(object):
+        # Largest abstract state space, (cells) ** (group size + 1), the
+        # backward search is allowed to allocate
+        max_search_space = 1 << 24
+
+        def __init__(self, groups, tables):
+            cells = Puzzle.size * Puzzle.size
+            self.groups = groups
+            self.tables = tables
+            # A placement is indexed by idx of '0' + cells * sum(idx of
+            # group[j] * cells ** j). The sums of all groups are kept on every
+            # state as one code, group g being multiplied by the product of the
+            # numbers of placements of the groups before it
+            self.group_of = dict()
+            self.weight = dict()
+            self.offsets = list()
+            self.sizes = list()
+            offset = 1
+            for group_idx, group in enumerate(groups):
+                for j, tile in enumerate(group):
+                    self.group_of[tile] = group_idx
+                    self.weight[tile] = cells ** j
+                self.offsets.append(offset)
+                self.sizes.append(cells ** len(group))
+                offset *= cells ** len(group)
+
+        @staticmethod
+        def load(goal_state, directory):
+            flattened_goal_state = [item for row in goal_state for item in row]
+            groups = Puzzle.PatternDatabase.partition(flattened_goal_state)
+            digest = Puzzle.goal_digest(flattened_goal_state)
+
+            tables = list()
+            for group in groups:
+                filename = "pdb_blank_%dx%d_%s_%s.bin" % (Puzzle.size, Puzzle.size, digest, "-".join(str(tile) for tile in group))
+                path = os.path.join(directory, filename)
+                if not os.path.exists(path):
+                    Puzzle.save_table(path, Puzzle.PatternDatabase.build_table(flattened_goal_state, group))
+                tables.append(Puzzle.map_table(path))
+            return Puzzle.PatternDatabase(groups, tables)
+
+        # Splits the tiles into equally sized groups of consecutive tiles, using
+        # as few groups as the search space limit allows
+        @staticmethod
+        def partition(flattened_goal_state):
+            cells = len(flattened_goal_state)
+            tiles = sorted(tile for tile in flattened_goal_state if tile != 0)
+            group_size = 1
+            while cells ** (group_size + 2) <= Puzzle.PatternDatabase.max_search_space:
+                group_size += 1
+            num_groups = -(-len(tiles) // group_size)
+            return [tiles[i * len(tiles) // num_groups:(i + 1) * len(tiles) // num_groups] for i in range(num_groups)]
+
+        # 0-1 breadth first search backwards from the goal over the abstract
+        # states (blank idx, idx of every group tile), encoded as
+        # blank + cells * (idx of group[0] + cells * (idx of group[1] + ...))
+        @staticmethod
+        def build_table(flattened_goal_state, group):
+            cells = len(flattened_goal_state)
+            neighbours = list()
+            for idx in range(cells):
+                (row, col) = int(idx / Puzzle.size), idx % Puzzle.size
+                neighbours.append([idx + delta for delta, possible in [
+                    (Puzzle.size, row < Puzzle.size - 1), (-Puzzle.size, row > 0),
+                    (1, col < Puzzle.size - 1), (-1, col > 0)] if possible])
+
+            start = flattened_goal_state.index(0)
+            for j, tile in enumerate(group):
+                start += flattened_goal_state.index(tile) * cells ** (j + 1)
+
+            distances = bytearray(b"\xff") * (cells ** (len(group) + 1))
+            distances[start] = 0
+            queue = deque([start])
+            while queue:
+                index = queue.popleft()
+                distance = distances[index]
+                blank, rest = index % cells, index // cells
+                positions = list()
+                for _ in group:
+                    positions.append(rest % cells)
+                    rest //= cells
+
+                for target in neighbours[blank]:
+                    if target in positions:
+                        # A group tile slides into the blank, which costs a move
+                        j = positions.index(target)
+                        next_index = index - blank + target + (blank - target) * cells ** (j + 1)
+                        if distances[next_index] > distance + 1:
+                            distances[next_index] = distance + 1
+                            queue.append(next_index)
+                    else:
+                        # Any other tile slides into the blank for free
+                        next_index = index - blank + target
+                        if distances[next_index] > distance:
+                            distances[next_index] = distance
+                            queue.appendleft(next_index)
+
+            return distances
+
+        def positions(self, state):
+            positions = [0] * (Puzzle.size * Puzzle.size)
+            for idx in range(Puzzle.size * Puzzle.size):
+                positions[state.tile_at(idx)] = idx
+            return positions
+
+        def evaluate(self, state):
+            positions = self.positions(state)
+            heuristic = 0
+            state.placement = 0
+            for group, table, offset in zip(self.groups, self.tables, self.offsets):
+                index = sum(positions[tile] * self.weight[tile] for tile in group)
+                heuristic += table[positions[0] + Puzzle.size * Puzzle.size * index]
+                state.placement += index * offset
+            return heuristic
+
+        # Only the group holding the moved tile changes its value, since the
+        # '0' moving past the other groups is free. Its index is read from the
+        # parent's code and shifted by the move, so no other tile is looked at.
+        # The '0' moves from to_idx to from_idx
+        def update(self, heuristic, state, tile, from_idx, to_idx):
+            cells = Puzzle.size * Puzzle.size
+            group_idx = self.group_of[tile]
+            table = self.tables[group_idx]
+            offset = self.offsets[group_idx]
+            previous_index = state.parent.placement // offset % self.sizes[group_idx]
+            shift = (to_idx - from_idx) * self.weight[tile]
+            state.placement = state.parent.placement + shift * offset
+            return heuristic - table[to_idx + cells * previous_index] + table[from_idx + cells * (previous_index + shift)]
+
+    # -----------------------------------------------------------------------------------------
+    # Move Table
+    # Next move towards the goal state for every 3 x 3 board, indexed by the
+    # rank of the board as a permutation of its 9 cells, one byte per board.
+    # Built once by a breadth first search backwards from the goal state, after
+    # which a board is solved by following the table, without any search
+    class MoveTable(object):
+        moves = ["UP", "DOWN", "LEFT", "RIGHT"]
+        solved = len(moves)
+        unreachable = 255
+
+        def __init__(self, table):
+            self.table = table
+
+        @staticmethod
+        def path(goal_state, directory):
+            flattened_goal_state = [item for row in goal_state for item in row]
+            return os.path.join(directory, "moves_3x3_%s.bin" % Puzzle.goal_digest(flattened_goal_state))
+
+        # Only boards of the 8-puzzle are small enough to tabulate
+        @staticmethod
+        def load(goal_state, directory):
+            path = Puzzle.MoveTable.path(goal_state, directory)
+            if len(goal_state) != 3 or not os.path.exists(path):
+                return None
+            return Puzzle.MoveTable(Puzzle.map_table(path))
+
+        @staticmethod
+        def build(goal_state, directory):
+            if len(goal_state) != 3:
+                raise ValueError("Move tables are only built for 3 x 3 boards!")
+            flattened_goal_state = [item for row in goal_state for item in row]
+            moves = Puzzle.MoveTable.moves
+            offsets = {"UP": 3, "DOWN": -3, "LEFT": 1, "RIGHT": -1}
+            opposite = {"UP": "DOWN", "DOWN": "UP", "LEFT": "RIGHT", "RIGHT": "LEFT"}
+
+            table = bytearray([Puzzle.MoveTable.unreachable]) * 362880
+            table[Puzzle.MoveTable.rank(flattened_goal_state)] = Puzzle.MoveTable.solved
+            queue = deque([flattened_goal_state])
+            while queue:
+                tiles = queue.popleft()
+                zero_idx = tiles.index(0)
+                for move in moves:
+                    target_idx = zero_idx + offsets[move]
+                    if not 0 <= target_idx < 9 or (move in ["LEFT", "RIGHT"] and int(target_idx / 3) != int(zero_idx / 3)):
+                        continue
+                    next_tiles = list(tiles)
+                    next_tiles[zero_idx], next_tiles[target_idx] = next_tiles[target_idx], 0
+                    rank = Puzzle.MoveTable.rank(next_tiles)
+                    if table[rank] == Puzzle.MoveTable.unreachable:
+                        # Reached by 'move' from a board closer to the goal,
+                        # so the opposite move leads back towards it
+                        table[rank] = moves.index(opposite[move])
+                        queue.append(next_tiles)
+
+            path = Puzzle.MoveTable.path(goal_state, directory)
+            Puzzle.save_table(path, table)
+            return path
+
+        # Lehmer code of the permutation, in the range [0, 9!)
+        @staticmethod
+        def rank(tiles):
+            rank = 0
+            for i in range(len(tiles)):
+                smaller = 0
+                for j in range(i + 1, len(tiles)):
+                    if tiles[j] < tiles[i]:
+                        smaller += 1
+                rank = rank * (len(tiles) - i) + smaller
+            return rank
+
+        def walk(self, tiles):
+            offsets = {"UP": 3, "DOWN": -3, "LEFT": 1, "RIGHT": -1}
+            tiles = list(tiles)
+            zero_idx = tiles.index(0)
+            actions = list()
+            while True:
+                code = self.table[Puzzle.MoveTable.rank(tiles)]
+                if code == Puzzle.MoveTable.solved:
+                    return actions
+                move = Puzzle.MoveTable.moves[code]
+                target_idx = zero_idx + offsets[move]
+                tiles[zero_idx], tiles[target_idx] = tiles[target_idx], 0
+                zero_idx = target_idx
+                actions.append(move)
+
     # -----------------------------------------------------------------------------------------
     # Helper Classes
     class State(object):
-        def __init__(self, values, moves = 0, parent = None, move_taken = None, calculate_eval_value = True):
+        def __init__(self, values, moves = 0, parent = None, move_taken = None, moved_tile = None):
             self.values = values
             self.parent = parent
             self.moves = moves
             self.move_taken = move_taken
-            self.evaluation_value = self.calculate_heuristic() + moves if calculate_eval_value else 0
+            self.placement = None               # group placements, kept by PatternDatabase
+            self.heuristic = self.calculate_heuristic(moved_tile)
+            self.evaluation_value = self.heuristic + moves
+
+        @staticmethod
+        def from_values(values):
+            return Puzzle.State(values)
 
-        # Total Manhattan Distance
-        def calculate_heuristic(self):
-            flattened_values = [item for row in self.values for item in row]
-            flattened_goal_state = [item for row in Puzzle.goal_state.values for item in row]
-            distance = 0
-            for current_idx, current_value in enumerate(flattened_values):
-                goal_state_idx = flattened_goal_state.index(current_value)
-                (current_row, current_col) = int(current_idx / 3), current_idx % 3
-                (goal_state_row, goal_state_col) = int(goal_state_idx / 3), goal_state_idx % 3
+        def tile_at(self, idx):
+            return self.values[int(idx / Puzzle.size)][idx % Puzzle.size]
 
-                distance += (abs(goal_state_row - current_row) + abs(goal_state_col - current_col))
-            return distance
+        # moved_tile is the (tile, from_idx, to_idx) that turned the parent
+        # into this state. States without a parent are evaluated in full
+        def calculate_heuristic(self, moved_tile = None):
+            if moved_tile is None:
+                return Puzzle.heuristic.evaluate(self)
+            return Puzzle.heuristic.update(self.parent.heuristic, self, *moved_tile)
 
         # Get all possible children states from the current state
         def calculate_moves(self):
@@ -75,42 +657,46 @@ class Puzzle(object):
                     if col != 0:
                         continue
 
-                    # If '0' is in the top two row, a possible state is to move the '0' down
-                    if row_idx in [0, 1]:
+                    # If '0' is not in the bottom row, a possible state is to move the '0' down
+                    if row_idx < Puzzle.size - 1:
                         output.append(self.move_zero_down(row_idx, col_idx))
 
-                    # If '0' is in the bottom two row, a possible state is to move the '0' up
-                    if row_idx in [1, 2]:
+                    # If '0' is not in the top row, a possible state is to move the '0' up
+                    if row_idx > 0:
                         output.append(self.move_zero_up(row_idx, col_idx))
 
-                    # If '0' is in the left two cols, a possible state is to move the '0' right
-                    if col_idx in [0, 1]:
+                    # If '0' is not in the right col, a possible state is to move the '0' right
+                    if col_idx < Puzzle.size - 1:
                         output.append(self.move_zero_right(row_idx, col_idx))
 
-                    # If '0' is in the right two cols, a possible state is to move the '0' left
-                    if col_idx in [1, 2]:
+                    # If '0' is not in the left col, a possible state is to move the '0' left
+                    if col_idx > 0:
                         output.append(self.move_zero_left(row_idx, col_idx))
             return output
 
         def move_zero_left(self, row, col):
             values = deepcopy(self.values)
             values[row][col-1], values[row][col] = values[row][col], values[row][col-1]
-            return Puzzle.State(values, self.moves + 1, self, "RIGHT")
+            idx = row * Puzzle.size + col
+            return Puzzle.State(values, self.moves + 1, self, "RIGHT", (values[row][col], idx - 1, idx))
         
         def move_zero_right(self, row, col):
             values = deepcopy(self.values)
             values[row][col+1], values[row][col] = values[row][col], values[row][col+1]
-            return Puzzle.State(values, self.moves+1, self, "LEFT")
+            idx = row * Puzzle.size + col
+            return Puzzle.State(values, self.moves+1, self, "LEFT", (values[row][col], idx + 1, idx))
 
         def move_zero_up(self, row, col):
             values = deepcopy(self.values)
             values[row-1][col], values[row][col] = values[row][col], values[row-1][col]
-            return Puzzle.State(values, self.moves+1, self, "DOWN")
+            idx = row * Puzzle.size + col
+            return Puzzle.State(values, self.moves+1, self, "DOWN", (values[row][col], idx - Puzzle.size, idx))
 
         def move_zero_down(self, row, col):
             values = deepcopy(self.values)
             values[row+1][col], values[row][col] = values[row][col], values[row+1][col]
-            return Puzzle.State(values, self.moves+1, self, "UP")
+            idx = row * Puzzle.size + col
+            return Puzzle.State(values, self.moves+1, self, "UP", (values[row][col], idx + Puzzle.size, idx))
 
         def is_goal_state(self):
             return self == Puzzle.goal_state
@@ -118,12 +704,104 @@ class Puzzle(object):
         def __hash__(self):
             return hash(str(self.values))
 
+        # Ties on the evaluation value go to the state with more moves, whose
+        # value relies less on the heuristic and is closer to the goal
         def __lt__(self, other):
-            return self.evaluation_value < other.evaluation_value
+            if self.evaluation_value != other.evaluation_value:
+                return self.evaluation_value < other.evaluation_value
+            return self.moves > other.moves
 
         def __eq__(self, other):
             return self.values == other.values
 
+    # Compact alternative to State. The board is packed into a single integer,
+    # b = Puzzle.bits per tile with the tile at index i stored at bits
+    # [b * i, b * i + b), and the index of the '0' is cached so successors are
+    # found by swapping two tiles' bits instead of scanning and deep copying a
+    # nested list
+    class PackedState(object):
+        __slots__ = ("board", "blank", "parent", "moves", "move_taken", "placement", "heuristic",
+            "evaluation_value")
+
+        def __init__(self, board, blank, moves = 0, parent = None, move_taken = None, moved_tile = None):
+            self.board = board
+            self.blank = blank
+            self.parent = parent
+            self.moves = moves
+            self.move_taken = move_taken
+            self.placement = None
+            self.heuristic = self.calculate_heuristic(moved_tile)
+            self.evaluation_value = self.heuristic + moves
+
+        @staticmethod
+        def from_values(values):
+            board, blank = 0, 0
+            for idx, value in enumerate([item for row in values for item in row]):
+                board |= value << (Puzzle.bits * idx)
+                if value == 0:
+                    blank = idx
+            return Puzzle.PackedState(board, blank)
+
+        @property
+        def values(self):
+            return [[self.tile_at(row * Puzzle.size + col) for col in range(Puzzle.size)] for row in range(Puzzle.size)]
+
+        def tile_at(self, idx):
+            return (self.board >> (Puzzle.bits * idx)) & ((1 << Puzzle.bits) - 1)
+
+        # moved_tile is the (tile, from_idx, to_idx) that turned the parent
+        # into this state. States without a parent are evaluated in full
+        def calculate_heuristic(self, moved_tile = None):
+            if moved_tile is None:
+                return Puzzle.heuristic.evaluate(self)
+            return Puzzle.heuristic.update(self.parent.heuristic, self, *moved_tile)
+
+        # Get all possible children states from the current state
+        # The order of the children matches State.calculate_moves
+        def calculate_moves(self):
+            output = []
+            (row_idx, col_idx) = int(self.blank / Puzzle.size), self.blank % Puzzle.size
+
+            # If '0' is not in the bottom row, a possible state is to move the '0' down
+            if row_idx < Puzzle.size - 1:
+                output.append(self.move_zero(self.blank + Puzzle.size, "UP"))
+
+            # If '0' is not in the top row, a possible state is to move the '0' up
+            if row_idx > 0:
+                output.append(self.move_zero(self.blank - Puzzle.size, "DOWN"))
+
+            # If '0' is not in the right col, a possible state is to move the '0' right
+            if col_idx < Puzzle.size - 1:
+                output.append(self.move_zero(self.blank + 1, "LEFT"))
+
+            # If '0' is not in the left col, a possible state is to move the '0' left
+            if col_idx > 0:
+                output.append(self.move_zero(self.blank - 1, "RIGHT"))
+            return output
+
+        # Swap the '0' with the tile at target_idx. The bits of the '0' are
+        # always empty, so the swap is a subtraction and an addition
+        def move_zero(self, target_idx, move_taken):
+            tile = self.tile_at(target_idx)
+            board = self.board - (tile << (Puzzle.bits * target_idx)) + (tile << (Puzzle.bits * self.blank))
+            return Puzzle.PackedState(board, target_idx, self.moves + 1, self, move_taken, (tile, target_idx, self.blank))
+
+        def is_goal_state(self):
+            return self == Puzzle.goal_state
+
+        def __hash__(self):
+            return hash(self.board)
+
+        # Ties on the evaluation value go to the state with more moves, whose
+        # value relies less on the heuristic and is closer to the goal
+        def __lt__(self, other):
+            if self.evaluation_value != other.evaluation_value:
+                return self.evaluation_value < other.evaluation_value
+            return self.moves > other.moves
+
+        def __eq__(self, other):
+            return self.board == other.board
+
     class PriorityQueue(object):
         def __init__(self):
             self.queue = []
@@ -147,37 +825,249 @@ class Puzzle(object):
         def is_empty(self):
             return len(self.queue) == 0
 
+    # -----------------------------------------------------------------------------------------
+    # Search Statistics
+    class SearchStats(object):
+        def __init__(self, algorithm, heuristic):
+            self.algorithm = algorithm
+            self.heuristic = heuristic
+            self.generated = 0
+            self.expanded = 0
+            self.duplicates = 0
+            self.stale = 0
+            self.peak_frontier = 0
+            self.peak_visited = 0
+            self.peak_depth = 0
+            self.solution_depth = None
+            self.total_seconds = 0.0
+            self.heuristic_seconds = 0.0
+            self.successor_seconds = 0.0
+            self.heap_seconds = 0.0
+
+        # The b for which a uniform tree of the solution depth holds as many
+        # nodes as were generated, i.e. generated = b + b^2 + ... + b^depth
+        def effective_branching_factor(self):
+            if not self.solution_depth or not self.generated:
+                return None
+            depth = self.solution_depth
+            low, high = 0.0, float(max(self.generated, 1))
+            for _ in range(100):
+                b = (low + high) / 2
+                if sum(b ** i for i in range(1, depth + 1)) < self.generated:
+                    low = b
+                else:
+                    high = b
+            return round((low + high) / 2, 4)
+
+        def as_dict(self):
+            return {
+                "algorithm": self.algorithm,
+                "heuristic": self.heuristic,
+                "solution_depth": self.solution_depth,
+                "nodes_generated": self.generated,
+                "nodes_expanded": self.expanded,
+                "duplicates_skipped": self.duplicates,
+                "stale_entries_skipped": self.stale,
+                "peak_frontier": self.peak_frontier,
+                "peak_visited": self.peak_visited,
+                "effective_branching_factor": self.effective_branching_factor(),
+                "seconds": {
+                    "total": self.total_seconds,
+                    "heuristic": self.heuristic_seconds,
+                    # Heuristic updates happen while children are generated
+                    "successors": max(self.successor_seconds - self.heuristic_seconds, 0.0),
+                    "heap": self.heap_seconds
+                }
+            }
+
+    class TimedPriorityQueue(PriorityQueue):
+        def __init__(self, stats):
+            super(Puzzle.TimedPriorityQueue, self).__init__()
+            self.stats = stats
+
+        def add(self, item):
+            start = perf_counter()
+            super(Puzzle.TimedPriorityQueue, self).add(item)
+            self.stats.heap_seconds += perf_counter() - start
+
+        def poll(self):
+            start = perf_counter()
+            item = super(Puzzle.TimedPriorityQueue, self).poll()
+            self.stats.heap_seconds += perf_counter() - start
+            return item
+
+    class ZeroHeuristic(object):
+        def evaluate(self, state):
+            return 0
+
+        def update(self, heuristic, state, tile, from_idx, to_idx):
+            return 0
+
+    class TimedHeuristic(object):
+        def __init__(self, heuristic, stats):
+            self.heuristic = heuristic
+            self.stats = stats
+
+        def evaluate(self, state):
+            start = perf_counter()
+            heuristic = self.heuristic.evaluate(state)
+            self.stats.heuristic_seconds += perf_counter() - start
+            return heuristic
+
+        def update(self, heuristic, state, tile, from_idx, to_idx):
+            start = perf_counter()
+            heuristic = self.heuristic.update(heuristic, state, tile, from_idx, to_idx)
+            self.stats.heuristic_seconds += perf_counter() - start
+            return heuristic
+
+# -----------------------------------------------------------------------------------------
+# Batch Solving
+# Boards are read from a stream as they are needed, solved in chunks by a pool
+# of worker processes and written one line of moves per board, in input order.
+# Every worker builds the heuristic once when it starts and reuses it for all
+# of its boards
+batch_settings = dict()
+
+def make_goal_state(n):
+    goal_state = [[0 for i in range(n)] for j in range(n)]
+    for i in range(1, n * n):
+        goal_state[(i-1)//n][(i-1) % n] = i
+    goal_state[n-1][n-1] = 0
+    return goal_state
+
+# Yields the n * n whitespace separated tokens of every board, regardless of
+# how they are split across lines, and the tokens of an incomplete last board.
+# The tokens are checked by parse_board, so a malformed board does not stop
+# the boards after it
+def read_boards(f, n):
+    tokens = list()
+    for line in f:
+        tokens.extend(line.split())
+        while len(tokens) >= n * n:
+            board, tokens = tokens[:n * n], tokens[n * n:]
+            yield board
+    if tokens:
+        yield tokens
+
+def parse_board(tokens, n):
+    numbers = [int(token) for token in tokens]
+    if sorted(numbers) != list(range(n * n)):
+        raise ValueError("Input is not an N x N board!")
+    return [numbers[i * n:(i + 1) * n] for i in range(n)]
+
+def init_batch_worker(goal_state, algorithm, heuristic):
+    batch_settings.update(goal_state = goal_state, algorithm = algorithm, heuristic = heuristic)
+    Puzzle.prepare(goal_state, heuristic)
+
+# Solves a chunk of boards given as tokens, one line of moves per board, or
+# INVALID for a board that is not a permutation of 0 to n * n - 1
+def solve_batch_chunk(boards):
+    goal_state = batch_settings["goal_state"]
+    answers = list()
+    for tokens in boards:
+        try:
+            init_state = parse_board(tokens, len(goal_state))
+        except ValueError:
+            answers.append("INVALID")
+            continue
+        puzzle = Puzzle(init_state, goal_state,
+            algorithm = batch_settings["algorithm"], heuristic = batch_settings["heuristic"])
+        answers.append(" ".join(puzzle.solve()))
+    return answers
+
+# Only a few chunks per worker are read ahead, so a long stream is never held
+# in memory all at once
+def solve_batch(boards, goal_state, output, algorithm = "astar", heuristic = "manhattan", workers = None, chunksize = 16):
+    # Built here first so pattern databases are written once, not by every worker
+    Puzzle.prepare(goal_state, heuristic)
+
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers, init_batch_worker, (goal_state, algorithm, heuristic))
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = list(islice(boards, chunksize))
+                if not chunk:
+                    break
+                pending.append(pool.apply_async(solve_batch_chunk, (chunk,)))
+            if not pending:
+                break
+            for answer in pending.popleft().get():
+                output.write(answer + '\n')
+            output.flush()
+    finally:
+        pool.close()
+        pool.join()
+
 if __name__ == "__main__":
-    # Do NOT modify below
-    if len(sys.argv) != 3:
-        raise ValueError("Wrong number of arguments!")
+    parser = argparse.ArgumentParser(description = "Solves an N x N sliding puzzle")
+    parser.add_argument("input", nargs = "?", help = "board with one row per line, '0' being the empty cell")
+    parser.add_argument("output", nargs = "?", help = "file the moves are appended to")
+    parser.add_argument("--algorithm", choices = ["astar", "idastar", "bidirectional"], default = "astar",
+        help = "idastar trades time for memory that is linear in the solution depth, "
+            "bidirectional searches from both ends and prints the depth they meet at")
+    parser.add_argument("--heuristic", choices = ["manhattan", "misplaced", "pdb"], default = "manhattan",
+        help = "pdb builds its pattern databases under " + Puzzle.tables_directory + " on first use")
+    parser.add_argument("--compare-heuristics", action = "store_true",
+        help = "also print the number of expanded nodes for every heuristic")
+    parser.add_argument("--batch", action = "store_true",
+        help = "input holds many boards and may be '-' for stdin; one line of moves is written per board, "
+            "or INVALID for a malformed one, output may be '-' for stdout")
+    parser.add_argument("--size", type = int, default = 3, help = "board width in --batch mode")
+    parser.add_argument("--workers", type = int, default = None,
+        help = "worker processes in --batch mode, defaults to the number of cores")
+    parser.add_argument("--stats", metavar = "PATH",
+        help = "write search statistics as JSON to PATH, or to stdout for '-'")
+    parser.add_argument("--build-move-table", action = "store_true",
+        help = "build the table of next moves for every 3 x 3 board, which later runs answer from")
+    args = parser.parse_args()
+
+    if args.build_move_table:
+        print("move table written to " + Puzzle.MoveTable.build(make_goal_state(3), Puzzle.tables_directory))
+        sys.exit(0)
+    if args.input is None or args.output is None:
+        parser.error("input and output are required")
+
+    if args.batch:
+        boards_file = sys.stdin if args.input == '-' else open(args.input, 'r')
+        output_file = sys.stdout if args.output == '-' else open(args.output, 'a')
+        solve_batch(read_boards(boards_file, args.size), make_goal_state(args.size), output_file,
+            args.algorithm, args.heuristic, args.workers)
+        sys.exit(0)
 
     try:
-        f = open(sys.argv[1], 'r')
+        f = open(args.input, 'r')
     except IOError:
         raise IOError("Input file not found!")
 
-    init_state = [[0 for i in range(3)] for j in range(3)]
-    goal_state = [[0 for i in range(3)] for j in range(3)]
-    lines = f.readlines()
-
-    i, j = 0, 0
-    for line in lines:
-        for number in line:
-            if '0' <= number <= '8':
-                init_state[i][j] = int(number)
-                j += 1
-                if j == 3:
-                    i += 1
-                    j = 0
-
-    for i in range(1, 9):
-        goal_state[(i-1)//3][(i-1) % 3] = i
-    goal_state[2][2] = 0
-
-    puzzle = Puzzle(init_state, goal_state)
+    numbers = [int(number) for number in f.read().split()]
+    n = int(round(len(numbers) ** 0.5))
+    if n * n != len(numbers) or sorted(numbers) != list(range(n * n)):
+        raise ValueError("Input is not an N x N board!")
+
+    init_state = [numbers[i * n:(i + 1) * n] for i in range(n)]
+    goal_state = make_goal_state(n)
+
+    if args.compare_heuristics:
+        for heuristic in ["manhattan", "misplaced", "pdb"]:
+            puzzle = Puzzle(init_state, goal_state, algorithm = args.algorithm, heuristic = heuristic,
+                use_move_table = False)
+            puzzle.solve()
+            print("%s: %d expanded nodes" % (heuristic, puzzle.expanded))
+
+    puzzle = Puzzle(init_state, goal_state, algorithm = args.algorithm, heuristic = args.heuristic,
+        collect_stats = args.stats is not None)
     ans = puzzle.solve()
+    if puzzle.meeting_depth is not None:
+        print("meeting depth: %d" % puzzle.meeting_depth)
+
+    if args.stats == '-':
+        print(json.dumps(puzzle.stats.as_dict(), indent = 4))
+    elif args.stats is not None:
+        with open(args.stats, 'w') as f:
+            json.dump(puzzle.stats.as_dict(), f, indent = 4)
 
-    with open(sys.argv[2], 'a') as f:
+    with open(args.output, 'a') as f:
         for answer in ans:
             f.write(answer+'\n')
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import importlib.util
+import multiprocessing
+from itertools import product
+
+# Runs every solver script with every heuristic and algorithm over a corpus
+# made by misc/board_creator.py. Each board is solved in a fresh process so the
+# peak RSS belongs to that board alone. Every answer is replayed and checked
+# against the optimal depth recorded in the corpus
+
+puzzle_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+solvers = ["a_star_manhattan", "a_star_num_misplaced"]
+heuristics = ["manhattan", "misplaced", "pdb"]
+algorithms = ["astar", "idastar", "bidirectional"]
+offsets = {"UP": 3, "DOWN": -3, "LEFT": 1, "RIGHT": -1}
+
+def load_solver(solver):
+    spec = importlib.util.spec_from_file_location(solver, os.path.join(puzzle_directory, solver + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Tables are loaded before the clock starts, so only the search is timed
+def run(task):
+    solver, heuristic, algorithm, board = task
+    module = load_solver(solver)
+    goal_state = module.make_goal_state(3)
+    module.Puzzle.prepare(goal_state, heuristic)
+
+    start = time.perf_counter()
+    puzzle = module.Puzzle(board, goal_state, algorithm = algorithm, heuristic = heuristic, use_move_table = False)
+    actions = puzzle.solve()
+    seconds = time.perf_counter() - start
+    return {
+        "actions": actions,
+        "seconds": seconds,
+        "expanded": puzzle.expanded,
+        # Kilobytes on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+def is_optimal(board, depth, actions):
+    tiles = [tile for row in board for tile in row]
+    zero_idx = tiles.index(0)
+    for action in actions:
+        target_idx = zero_idx + offsets.get(action, 0)
+        if action not in offsets or not 0 <= target_idx < 9 or \
+                (action in ["LEFT", "RIGHT"] and target_idx // 3 != zero_idx // 3):
+            return False
+        tiles[zero_idx], tiles[target_idx] = tiles[target_idx], 0
+        zero_idx = target_idx
+    return tiles == [1, 2, 3, 4, 5, 6, 7, 8, 0] and len(actions) == depth
+
+def summarize(solver, heuristic, algorithm, band, results):
+    seconds = sorted(result["seconds"] for result in results)
+    return {
+        "solver": solver,
+        "heuristic": heuristic,
+        "algorithm": algorithm,
+        "depths": band,
+        "boards": len(results),
+        "mean_ms": 1000 * sum(seconds) / len(seconds),
+        "max_ms": 1000 * seconds[-1],
+        "mean_expanded": sum(result["expanded"] for result in results) / float(len(results)),
+        "peak_rss_mb": max(result["peak_rss_kb"] for result in results) / 1024.0,
+        "optimal": sum(1 for result in results if result["optimal"])
+    }
+
+def print_table(rows, previous):
+    previous_rows = dict()
+    for row in previous:
+        previous_rows[(row["solver"], row["heuristic"], row["algorithm"], row["depths"])] = row
+
+    header = "%-22s %-10s %-14s %-7s %6s %10s %10s %12s %8s %8s" % (
+        "solver", "heuristic", "algorithm", "depths", "boards", "mean ms", "max ms", "expanded", "RSS MB", "optimal")
+    if previous:
+        header += " %9s %9s" % ("ms ratio", "exp ratio")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        line = "%-22s %-10s %-14s %-7s %6d %10.2f %10.2f %12.1f %8.1f %8s" % (
+            row["solver"], row["heuristic"], row["algorithm"], row["depths"], row["boards"], row["mean_ms"],
+            row["max_ms"], row["mean_expanded"], row["peak_rss_mb"], "%d/%d" % (row["optimal"], row["boards"]))
+        before = previous_rows.get((row["solver"], row["heuristic"], row["algorithm"], row["depths"]))
+        if before is not None:
+            line += " %9.2f %9.2f" % (row["mean_ms"] / max(before["mean_ms"], 1e-9),
+                row["mean_expanded"] / max(before["mean_expanded"], 1e-9))
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmarks the 8-puzzle solvers")
+    parser.add_argument("corpus", help = "boards created by misc/board_creator.py")
+    parser.add_argument("--solvers", nargs = "+", choices = solvers, default = solvers)
+    parser.add_argument("--heuristics", nargs = "+", choices = heuristics, default = heuristics)
+    parser.add_argument("--algorithms", nargs = "+", choices = algorithms, default = ["astar"])
+    parser.add_argument("--band", type = int, default = 8, help = "width of the depth buckets in the table")
+    parser.add_argument("--save", metavar = "PATH", help = "write the table rows as JSON")
+    parser.add_argument("--compare", metavar = "PATH", help = "rows saved by an earlier run to show ratios against")
+    args = parser.parse_args()
+
+    with open(args.corpus, "r") as f:
+        corpus = json.load(f)
+    previous = list()
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)
+
+    # Pattern databases are built once here instead of by every worker
+    if "pdb" in args.heuristics:
+        for solver in args.solvers:
+            load_solver(solver).Puzzle.prepare(load_solver(solver).make_goal_state(3), "pdb")
+
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(1, maxtasksperchild = 1)
+    rows = list()
+    all_optimal = True
+    try:
+        for solver, heuristic, algorithm in product(args.solvers, args.heuristics, args.algorithms):
+            bands = dict()
+            for entry in corpus:
+                result = pool.apply(run, ((solver, heuristic, algorithm, entry["board"]),))
+                result["optimal"] = is_optimal(entry["board"], entry["depth"], result["actions"])
+                if not result["optimal"]:
+                    all_optimal = False
+                    print("NOT OPTIMAL: %s %s %s board %d" % (solver, heuristic, algorithm, entry["index"]))
+                low = entry["depth"] - entry["depth"] % args.band
+                bands.setdefault(low, []).append(result)
+            for low in sorted(bands):
+                band = "%d-%d" % (low, low + args.band - 1)
+                rows.append(summarize(solver, heuristic, algorithm, band, bands[low]))
+    finally:
+        pool.close()
+        pool.join()
+
+    print_table(rows, previous)
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(rows, f, indent = 4)
+    if not all_optimal:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import json
+import random
+import sys
+from collections import deque
+
+# Creates a corpus of random solvable 8-puzzle boards, bucketed by the length
+# of their shortest solution. The lengths come from a breadth first search
+# backwards from the goal over every reachable board, so they also serve as
+# the reference answers that misc/benchmark.py checks the solvers against
+
+goal_state = (1, 2, 3, 4, 5, 6, 7, 8, 0)
+
+def find_depths(goal):
+    depths = {goal: 0}
+    queue = deque([goal])
+    while queue:
+        board = queue.popleft()
+        zero_idx = board.index(0)
+        for target_idx in [zero_idx - 3, zero_idx + 3, zero_idx - 1, zero_idx + 1]:
+            if not 0 <= target_idx < 9:
+                continue
+            if abs(target_idx - zero_idx) == 1 and target_idx // 3 != zero_idx // 3:
+                continue
+            next_board = list(board)
+            next_board[zero_idx], next_board[target_idx] = next_board[target_idx], 0
+            next_board = tuple(next_board)
+            if next_board not in depths:
+                depths[next_board] = depths[board] + 1
+                queue.append(next_board)
+    return depths
+
+def main(boards_per_depth, filename, seed):
+    random.seed(seed)
+    buckets = dict()
+    for board, depth in find_depths(goal_state).items():
+        buckets.setdefault(depth, []).append(board)
+
+    output = list()
+    for depth in sorted(buckets):
+        for board in random.sample(buckets[depth], min(boards_per_depth, len(buckets[depth]))):
+            output.append({
+                "index": len(output) + 1,
+                "depth": depth,
+                "board": [list(board[i * 3:(i + 1) * 3]) for i in range(3)]
+            })
+
+    with open(filename, "w") as f:
+        json.dump(output, f, indent = 4)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [3, 4]:
+        print("\nUsage: python3 misc/board_creator.py boards_per_depth corpus.json [seed]\n")
+        raise ValueError("Wrong number of arguments!")
+    print("CREATING BOARDS")
+    main(int(sys.argv[1]), sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else 3243)
+    print("FINISHED")
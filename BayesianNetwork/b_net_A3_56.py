@@ -1,9 +1,14 @@
 import sys
 import json
-from copy import deepcopy
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class BayesianNetwork(object):
-    def __init__(self, structure, values, queries):
+    def __init__(self, structure, values, queries, cache_size = 100000):
         # -----------------------------------------------------------------------------------------
         # GIVEN ATTRIBUTES
         self.variables = structure["variables"]
@@ -18,12 +23,35 @@ class BayesianNetwork(object):
         self.network = dict()
         self.topo_order = list()
         self.topo_group = dict()
+        self.factors = None
+        self.domain_index = None
+        self.tensor_cpt = None
+        self.junction_tree = None
+        # A calibration holds a belief for every clique, so far fewer of them are
+        # kept than of the single probabilities below
+        self.calibrations = BayesianNetwork.LRUCache(min(cache_size, 1000))
+
+        # Probabilities of whole assignments (joints and normalization factors)
+        # and sub-sums of calculate_probability_helper, at most cache_size each
+        self.probability_cache = BayesianNetwork.LRUCache(cache_size)
+        self.subsum_cache = BayesianNetwork.LRUCache(cache_size)
+
+        # Pruned enumeration plans, keyed by the query and evidence variables, and
+        # the relevance of the orders filtered by calculate_probability, keyed by order
+        self.query_plans = BayesianNetwork.LRUCache(cache_size)
+        self.filtered_plans = BayesianNetwork.LRUCache(cache_size)
+        self.kahn_order = list()
 
     '''
     This function constructs an adjacency list based on the self.dependencies
     The adjacency list is stored as a class attribute at self.network
+    With tensors = True, every CPT and prior is also stored as a NumPy array with
+        one axis per variable, the variable's own axis first and then its
+        dependencies, in self.tensor_cpt. The values of every variable are mapped
+        to their index in self.variables by self.domain_index.
+        variable_elimination then works on these arrays.
     '''
-    def construct(self):
+    def construct(self, tensors = False):
         # Constructing Network
         for variable in self.variables:
             self.network[variable] = list()
@@ -41,27 +69,74 @@ class BayesianNetwork(object):
                     ordered_assignment.append(dependency_assignment)
                 self.cpt[variable][tuple(ordered_assignment)] = row["probability"]
 
+        if tensors:
+            self.construct_tensors()
+
+    def construct_tensors(self):
+        if numpy is None:
+            raise ImportError("construct(tensors = True) needs NumPy")
+
+        self.domain_index = dict()
+        for variable, domain in self.variables.items():
+            self.domain_index[variable] = dict((value, i) for i, value in enumerate(domain))
+
+        self.tensor_cpt = dict()
+        for variable in self.variables:
+            if variable not in self.dependencies:
+                axes = [variable]
+                rows = [((value,), probability) for value, probability in self.prior_probabilities[variable].items()]
+            else:
+                axes = [variable] + self.dependencies[variable]
+                rows = self.cpt[variable].items()
+            tensor = numpy.zeros([len(self.variables[axis]) for axis in axes])
+            for assignment, probability in rows:
+                tensor[tuple(self.domain_index[axis][value] for axis, value in zip(axes, assignment))] = probability
+            self.tensor_cpt[variable] = tensor
+
     '''
     This function reads the queries stored in self.queries
     Using the inference by enumeration method, it generates an answer for every query
+    With method = "variable_elimination", the answers come from variable_elimination
+        instead, eliminating hidden variables in the given ordering
+        ("min_fill" or "min_weight")
+    With method = "junction_tree", the network is compiled into a junction tree once
+        and the answers come from its calibrated clique potentials, which are
+        reused by every query with the same evidence
+    Enumeration only sums over the variables plan_query finds relevant to the query,
+        prune = False sums over the variables kept by calculate_probability instead
     The answers are stored in self.answer
     '''
-    def infer(self):
+    def infer(self, method = "enumeration", ordering = "min_fill", prune = True):
         # Topological Sort
         self.topo_order, self.topo_group = BayesianNetwork.topo_sort(self.network, self.variables)
+        self.kahn_order = BayesianNetwork.kahn_sort(self.network, self.variables)
 
         for query in self.queries:
             index = query["index"]
             query_vars = query["tofind"]
             evidence_vars = query["given"]
 
-            initial_assignment = dict()
-            initial_assignment.update(query_vars)
-            initial_assignment.update(evidence_vars)
+            if method == "variable_elimination":
+                normalized_cond_prob = self.variable_elimination(query_vars, evidence_vars, ordering)
+            elif method == "junction_tree":
+                normalized_cond_prob = self.junction_tree_probability(query_vars, evidence_vars, ordering)
+            elif prune:
+                topo_order, relevant_evidence, relevance = self.plan_query(query_vars, evidence_vars)
+                evidence_assignment = dict((var, evidence_vars[var]) for var in relevant_evidence)
+                initial_assignment = dict((var, value) for var, value in query_vars.items() if var not in evidence_vars)
+                initial_assignment.update(evidence_assignment)
+
+                conditional_probability = self.planned_probability(topo_order, relevance, initial_assignment)
+                normalization_factor = self.planned_probability(topo_order, relevance, evidence_assignment)
+                normalized_cond_prob = conditional_probability / normalization_factor
+            else:
+                initial_assignment = dict()
+                initial_assignment.update(query_vars)
+                initial_assignment.update(evidence_vars)
 
-            conditional_probability = self.calculate_probability(initial_assignment)
-            normalization_factor = self.calculate_probability(evidence_vars)
-            normalized_cond_prob = conditional_probability / normalization_factor
+                conditional_probability = self.calculate_probability(initial_assignment)
+                normalization_factor = self.calculate_probability(evidence_vars)
+                normalized_cond_prob = conditional_probability / normalization_factor
 
             self.answer.append({
                 "index": index,
@@ -93,7 +168,107 @@ class BayesianNetwork(object):
             elif self.topo_group[variable] == largest_topo_group_num and variable in initial_assignment:
                 topo_order.append(variable)
 
-        return self.calculate_probability_helper(topo_order, initial_assignment)
+        topo_order = tuple(topo_order)
+        relevance = self.filtered_plans.get(topo_order)
+        if relevance is None:
+            relevance = self.plan_relevance(topo_order)
+            self.filtered_plans.put(topo_order, relevance)
+        return self.planned_probability(topo_order, relevance, initial_assignment)
+
+    '''
+    This function sums the product of the CPTs of the variables in topo_order over the
+        values of the ones not in assignment, through the probability cache
+    The order itself, a tuple, keys both caches, so entries need no index of orders
+        that would outlive them
+    '''
+    def planned_probability(self, topo_order, relevance, assignment):
+        key = (topo_order, tuple(sorted(assignment.items())))
+        probability = self.probability_cache.get(key)
+        if probability is None:
+            subsum_relevance = relevance if self.subsum_cache.capacity > 0 else None
+            probability = self.calculate_probability_helper(topo_order, dict(assignment), relevance = subsum_relevance)
+            self.probability_cache.put(key, probability)
+        return probability
+
+    '''
+    This function plans the enumeration of P(query_vars|evidence_vars) over the smallest
+        set of variables that can change the answer.
+    Barren nodes, which are neither queried, observed nor ancestors of a queried or
+        observed variable, are dropped first, leaving the ancestral set.
+    In the moral graph of the ancestral set, with the observed variables taken out, only
+        the variables still connected to a query variable are kept. The others are
+        d-separated from the query by the evidence. So are the observed variables not
+        next to a kept one, which are dropped from the evidence.
+    The CPTs of the kept variables, and of the relevant observed variables whose
+        dependencies are all kept or observed, make up the plan. The CPTs left out
+        multiply the joint and the normalization factor by the same constant.
+    Plans depend only on which variables are queried and observed, and are cached on them.
+    Returns the plan as a tuple in topological order, the relevant observed variables
+        and the relevance of the plan.
+    '''
+    def plan_query(self, query_vars, evidence_vars):
+        key = (frozenset(query_vars), frozenset(evidence_vars))
+        plan = self.query_plans.get(key)
+        if plan is not None:
+            return plan
+
+        query = set(query_vars) - set(evidence_vars)
+        evidence = set(evidence_vars)
+
+        ancestors = set()
+        stack = list(query | evidence)
+        while stack:
+            var = stack.pop()
+            if var not in ancestors:
+                ancestors.add(var)
+                stack.extend(self.dependencies.get(var, []))
+
+        moral = dict((var, set()) for var in ancestors)
+        for var in ancestors:
+            family = [var] + self.dependencies.get(var, [])
+            for a in family:
+                for b in family:
+                    if a != b:
+                        moral[a].add(b)
+
+        connected = set()
+        relevant_evidence = set()
+        stack = list(query)
+        while stack:
+            var = stack.pop()
+            if var in connected:
+                continue
+            connected.add(var)
+            for neighbour in moral[var]:
+                if neighbour in evidence:
+                    relevant_evidence.add(neighbour)
+                elif neighbour not in connected:
+                    stack.append(neighbour)
+
+        kept = connected | relevant_evidence
+        planned = set(connected)
+        for var in relevant_evidence:
+            if all(dependency in kept for dependency in self.dependencies.get(var, [])):
+                planned.add(var)
+
+        topo_order = tuple(var for var in self.kahn_order if var in planned)
+        plan = (topo_order, sorted(relevant_evidence), self.plan_relevance(topo_order))
+        self.query_plans.put(key, plan)
+        return plan
+
+    '''
+    This function lists, for each index of a topo order, the variables a sub-sum starting
+        there reads: the remaining variables and their dependencies. Two assignments that
+        agree on those give the same sub-sum.
+    '''
+    def plan_relevance(self, topo_order):
+        relevance = list()
+        for index in range(len(topo_order)):
+            relevant = set(topo_order[index:])
+            for var in topo_order[index:]:
+                relevant.update(self.dependencies.get(var, []))
+            relevance.append(sorted(relevant))
+        return relevance
 
     '''
     This function evaluates the variables in a topological order.
@@ -102,11 +277,17 @@ class BayesianNetwork(object):
     If the variable has not been assigned a value, it will then attempt to find all
         possible value assignment, which depends on the variables' domains
     '''
-    def calculate_probability_helper(self, topo_order, assignment, index = 0):
+    def calculate_probability_helper(self, topo_order, assignment, index = 0, relevance = None):
         # Stop recursion once we have assigned all variables
         if index >= len(topo_order):
             return 1
 
+        if relevance is not None:
+            key = (topo_order, index, tuple(assignment.get(var) for var in relevance[index]))
+            cached = self.subsum_cache.get(key)
+            if cached is not None:
+                return cached
+
         # Recursively assign values to variables and 
         # summing out the probability of each valid assignment
         var = topo_order[index]
@@ -117,13 +298,16 @@ class BayesianNetwork(object):
                 assignment[var] = domain    
                 total_probability += (
                     self.find_probability(var, assignment) *
-                    self.calculate_probability_helper(topo_order, deepcopy(assignment), index + 1)
+                    self.calculate_probability_helper(topo_order, dict(assignment), index + 1, relevance)
                 )
         else:
             total_probability += (
                 self.find_probability(var, assignment) *
-                self.calculate_probability_helper(topo_order, assignment, index + 1)
+                self.calculate_probability_helper(topo_order, assignment, index + 1, relevance)
             )
+
+        if relevance is not None:
+            self.subsum_cache.put(key, total_probability)
         return total_probability
             
     '''
@@ -140,8 +324,387 @@ class BayesianNetwork(object):
             ordered_assignment.append(assignment[dependency])
         return self.cpt[var][tuple(ordered_assignment)]
 
+    '''
+    This function builds one factor per variable, from self.cpt for variables
+        with dependencies and from self.prior_probabilities for the others,
+        or from self.tensor_cpt when the tensors were constructed
+    '''
+    def make_factors(self):
+        if self.tensor_cpt is not None:
+            return [BayesianNetwork.TensorFactor(tuple([var] + self.dependencies.get(var, [])),
+                self.tensor_cpt[var], self.domain_index) for var in self.variables]
+
+        factors = list()
+        for var in self.variables:
+            if var not in self.dependencies:
+                table = dict(((value,), probability) for value, probability in self.prior_probabilities[var].items())
+                factors.append(BayesianNetwork.Factor((var,), table))
+            else:
+                factors.append(BayesianNetwork.Factor(tuple([var] + self.dependencies[var]), dict(self.cpt[var])))
+        return factors
+
+    '''
+    This function calculates P(query_vars|evidence_vars) by variable elimination.
+    Every factor is first reduced by the evidence. The hidden variables, which are
+        neither queried nor observed, are then summed out one at a time, each time
+        multiplying only the factors that mention that variable.
+    What remains is a factor over the query variables, which is normalized.
+    A query variable that is also observed takes its observed value, as in
+        calculate_probability.
+    '''
+    def variable_elimination(self, query_vars, evidence_vars, ordering = "min_fill"):
+        if self.factors is None:
+            self.factors = self.make_factors()
+
+        query = dict((var, value) for var, value in query_vars.items() if var not in evidence_vars)
+        factors = [factor.reduce(evidence_vars) for factor in self.factors]
+        hidden = [var for var in self.variables if var not in query and var not in evidence_vars]
+
+        for var in self.elimination_order(factors, hidden, ordering):
+            involved = [factor for factor in factors if var in factor.variables]
+            factors = [factor for factor in factors if var not in factor.variables]
+            product = involved[0]
+            for factor in involved[1:]:
+                product = product.multiply(factor)
+            factors.append(product.sum_out(var))
+
+        result = factors[0]
+        for factor in factors[1:]:
+            result = result.multiply(factor)
+        return result.probability(query) / result.total()
+
+    '''
+    This function orders the hidden variables greedily on the interaction graph of
+        the factors, where variables sharing a factor are neighbours.
+    "min_fill" picks the variable whose elimination adds the fewest new edges between
+        its neighbours, "min_weight" the one whose product factor is smallest.
+    Ties are broken by the order of self.variables.
+    '''
+    def elimination_order(self, factors, hidden, ordering, cliques = None):
+        neighbours = dict((var, set()) for var in self.variables)
+        for factor in factors:
+            for var in factor.variables:
+                neighbours[var].update(factor.variables)
+        for var in neighbours:
+            neighbours[var].discard(var)
+
+        def score(var):
+            if ordering == "min_weight":
+                weight = len(self.variables[var])
+                for neighbour in neighbours[var]:
+                    weight *= len(self.variables[neighbour])
+                return weight
+            fill = 0
+            for a in neighbours[var]:
+                for b in neighbours[var]:
+                    if a < b and b not in neighbours[a]:
+                        fill += 1
+            return fill
+
+        order = list()
+        remaining = list(hidden)
+        while remaining:
+            var = min(remaining, key = score)
+            if cliques is not None:
+                cliques.append(frozenset(neighbours[var]) | frozenset([var]))
+            for a in neighbours[var]:
+                neighbours[a].update(neighbours[var])
+                neighbours[a].discard(a)
+                neighbours[a].discard(var)
+            remaining.remove(var)
+            order.append(var)
+        return order
+
+    '''
+    This function compiles the network into a junction tree, stored at self.junction_tree
+    Eliminating every variable from the moral graph, which is the interaction graph of
+        the CPT factors, gives the cliques of a triangulation. The maximal ones are
+        joined by a maximum spanning tree on the size of their separators, which gives
+        the running intersection property.
+    Every CPT factor is assigned to one clique holding all of its variables.
+    '''
+    def compile_junction_tree(self, ordering = "min_fill"):
+        if self.factors is None:
+            self.factors = self.make_factors()
+
+        eliminated = list()
+        self.elimination_order(self.factors, list(self.variables), ordering, eliminated)
+        cliques = list()
+        for clique in eliminated:
+            if not any(clique <= other for other in eliminated if other != clique) and clique not in cliques:
+                cliques.append(clique)
+
+        # Kruskal's algorithm, largest separators first
+        candidates = sorted(((len(cliques[i] & cliques[j]), i, j) for i in range(len(cliques))
+            for j in range(i + 1, len(cliques))), key = lambda edge: -edge[0])
+        component = list(range(len(cliques)))
+        def find(i):
+            while component[i] != i:
+                i = component[i]
+            return i
+        neighbours = dict((i, list()) for i in range(len(cliques)))
+        for _, i, j in candidates:
+            if find(i) != find(j):
+                component[find(i)] = find(j)
+                neighbours[i].append(j)
+                neighbours[j].append(i)
+
+        assigned = dict((i, list()) for i in range(len(cliques)))
+        for factor in self.factors:
+            for i, clique in enumerate(cliques):
+                if set(factor.variables) <= clique:
+                    assigned[i].append(factor)
+                    break
+
+        # Cliques in depth first order from clique 0, with the parent of each
+        order = list()
+        parents = {0: None}
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            for j in neighbours[i]:
+                if j not in parents:
+                    parents[j] = i
+                    stack.append(j)
+
+        self.junction_tree = {
+            "cliques": cliques,
+            "neighbours": neighbours,
+            "assigned": assigned,
+            "order": order,
+            "parents": parents
+        }
+        self.calibrations = BayesianNetwork.LRUCache(self.calibrations.capacity)
+
+    '''
+    This function calibrates the junction tree for one set of evidence and returns the
+        clique beliefs, which are the potentials P(clique variables, evidence) with the
+        evidence variables reduced away.
+    Messages are passed from the leaves to clique 0 and back (Shafer-Shenoy), so
+        no potential is ever divided.
+    Beliefs are kept per distinct evidence set in self.calibrations, an LRUCache.
+    '''
+    def calibrate(self, evidence_vars):
+        key = tuple(sorted(evidence_vars.items()))
+        beliefs = self.calibrations.get(key)
+        if beliefs is not None:
+            return beliefs
+
+        tree = self.junction_tree
+        potentials = dict()
+        for i in range(len(tree["cliques"])):
+            potential = self.unit_factor()
+            for factor in tree["assigned"][i]:
+                potential = potential.multiply(factor.reduce(evidence_vars))
+            potentials[i] = potential
+
+        messages = dict()
+        def send(i, j):
+            message = potentials[i]
+            for k in tree["neighbours"][i]:
+                if k != j:
+                    message = message.multiply(messages[(k, i)])
+            for var in message.variables:
+                if var not in tree["cliques"][j]:
+                    message = message.sum_out(var)
+            messages[(i, j)] = message
+
+        for i in reversed(tree["order"]):
+            if tree["parents"][i] is not None:
+                send(i, tree["parents"][i])
+        for i in tree["order"]:
+            if tree["parents"][i] is not None:
+                send(tree["parents"][i], i)
+
+        beliefs = list()
+        for i in range(len(tree["cliques"])):
+            belief = potentials[i]
+            for k in tree["neighbours"][i]:
+                belief = belief.multiply(messages[(k, i)])
+            beliefs.append(belief)
+        self.calibrations.put(key, beliefs)
+        return beliefs
+
+    '''
+    This function calculates P(query_vars|evidence_vars) from calibrated beliefs.
+    The query variables found together in one clique are read off its belief. When
+        they are spread over several cliques, the chain rule is applied: the ones
+        already answered join the evidence and the tree is calibrated again for the
+        rest, which is cached like any other evidence set.
+    '''
+    def junction_tree_probability(self, query_vars, evidence_vars, ordering = "min_fill"):
+        if self.junction_tree is None:
+            self.compile_junction_tree(ordering)
+
+        remaining = dict((var, value) for var, value in query_vars.items() if var not in evidence_vars)
+        evidence = dict(evidence_vars)
+        probability = 1
+        while True:
+            beliefs = self.calibrate(evidence)
+            best = max(range(len(beliefs)), key = lambda i: len(self.junction_tree["cliques"][i].intersection(remaining)))
+            part = dict((var, value) for var, value in remaining.items() if var in self.junction_tree["cliques"][best])
+
+            marginal = beliefs[best]
+            for var in marginal.variables:
+                if var not in part:
+                    marginal = marginal.sum_out(var)
+            probability *= marginal.probability(part) / marginal.total()
+            for var in part:
+                del remaining[var]
+            if not remaining or probability == 0:
+                return probability
+            evidence.update(part)
+
+    '''
+    This function reports the hits, misses and sizes of the probability, sub-sum, plan,
+        filtered order and calibration caches, to size them by
+    '''
+    def cache_stats(self):
+        return {
+            "probability": self.probability_cache.stats(),
+            "subsum": self.subsum_cache.stats(),
+            "plan": self.query_plans.stats(),
+            "filtered": self.filtered_plans.stats(),
+            "calibration": self.calibrations.stats()
+        }
+
+    def unit_factor(self):
+        if self.tensor_cpt is not None:
+            return BayesianNetwork.TensorFactor((), numpy.array(1.0), self.domain_index)
+        return BayesianNetwork.Factor((), {(): 1})
+
     # -----------------------------------------------------------------------------------------
     # Additional Methods
+    '''
+    A dict holding at most capacity entries, dropping the least recently used one when
+        full. A capacity of 0 turns caching off
+    '''
+    class LRUCache(object):
+        def __init__(self, capacity):
+            self.capacity = capacity
+            self.entries = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+        def get(self, key):
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+        def put(self, key, value):
+            if self.capacity <= 0:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last = False)
+
+        def stats(self):
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+                "capacity": self.capacity
+            }
+
+    '''
+    A factor maps every assignment of its variables, a tuple of values in the order of
+        its own variables, to a probability
+    '''
+    class Factor(object):
+        def __init__(self, variables, table):
+            self.variables = variables
+            self.table = table
+
+        def reduce(self, evidence):
+            kept = [i for i, var in enumerate(self.variables) if var not in evidence]
+            if len(kept) == len(self.variables):
+                return self
+            observed = [(i, evidence[var]) for i, var in enumerate(self.variables) if var in evidence]
+            table = dict()
+            for assignment, probability in self.table.items():
+                if all(assignment[i] == value for i, value in observed):
+                    table[tuple(assignment[i] for i in kept)] = probability
+            return BayesianNetwork.Factor(tuple(self.variables[i] for i in kept), table)
+
+        def multiply(self, other):
+            shared = [var for var in self.variables if var in other.variables]
+            extra = [var for var in other.variables if var not in self.variables]
+            own_shared = [self.variables.index(var) for var in shared]
+            other_shared = [other.variables.index(var) for var in shared]
+            other_extra = [other.variables.index(var) for var in extra]
+
+            # Rows of other grouped by the values of the shared variables
+            groups = dict()
+            for assignment, probability in other.table.items():
+                key = tuple(assignment[i] for i in other_shared)
+                groups.setdefault(key, []).append((tuple(assignment[i] for i in other_extra), probability))
+
+            table = dict()
+            for assignment, probability in self.table.items():
+                for rest, other_probability in groups.get(tuple(assignment[i] for i in own_shared), ()):
+                    table[assignment + rest] = probability * other_probability
+            return BayesianNetwork.Factor(self.variables + tuple(extra), table)
+
+        def sum_out(self, var):
+            i = self.variables.index(var)
+            table = dict()
+            for assignment, probability in self.table.items():
+                key = assignment[:i] + assignment[i + 1:]
+                table[key] = table.get(key, 0) + probability
+            return BayesianNetwork.Factor(self.variables[:i] + self.variables[i + 1:], table)
+
+        def probability(self, assignment):
+            return self.table.get(tuple(assignment[var] for var in self.variables), 0)
+
+        def total(self):
+            return sum(self.table.values())
+
+    '''
+    The same operations as Factor on a NumPy array with one axis per variable, where
+        domain_index maps every value to its index along its variable's axis
+    '''
+    class TensorFactor(object):
+        def __init__(self, variables, tensor, domain_index):
+            self.variables = variables
+            self.tensor = tensor
+            self.domain_index = domain_index
+
+        def reduce(self, evidence):
+            if not any(var in evidence for var in self.variables):
+                return self
+            index = tuple(self.domain_index[var][evidence[var]] if var in evidence else slice(None)
+                for var in self.variables)
+            variables = tuple(var for var in self.variables if var not in evidence)
+            return BayesianNetwork.TensorFactor(variables, self.tensor[index], self.domain_index)
+
+        # The other tensor's axes are moved into the order of the product's
+        # variables, and size-one axes stand in for the variables it lacks, so
+        # the two multiply by broadcasting
+        def multiply(self, other):
+            extra = tuple(var for var in other.variables if var not in self.variables)
+            variables = self.variables + extra
+            own = self.tensor.reshape(self.tensor.shape + (1,) * len(extra))
+            order = [other.variables.index(var) for var in variables if var in other.variables]
+            shape = [other.tensor.shape[other.variables.index(var)] if var in other.variables else 1 for var in variables]
+            aligned = other.tensor.transpose(order).reshape(shape)
+            return BayesianNetwork.TensorFactor(variables, own * aligned, self.domain_index)
+
+        def sum_out(self, var):
+            i = self.variables.index(var)
+            return BayesianNetwork.TensorFactor(self.variables[:i] + self.variables[i + 1:],
+                self.tensor.sum(axis = i), self.domain_index)
+
+        def probability(self, assignment):
+            return float(self.tensor[tuple(self.domain_index[var][assignment[var]] for var in self.variables)])
+
+        def total(self):
+            return float(self.tensor.sum())
+
     @staticmethod
     def topo_sort(adjacency_list, vertices):
         topo_order = list()
@@ -154,6 +717,24 @@ class BayesianNetwork(object):
         topo_order.reverse()
         return topo_order, topo_group
 
+    '''
+    Kahn's algorithm: a variable comes after all of its dependencies
+    '''
+    @staticmethod
+    def kahn_sort(adjacency_list, vertices):
+        in_degree = dict((vertex, 0) for vertex in vertices)
+        for vertex in vertices:
+            for neighbour in adjacency_list[vertex]:
+                in_degree[neighbour] += 1
+
+        topo_order = [vertex for vertex in vertices if in_degree[vertex] == 0]
+        for vertex in topo_order:
+            for neighbour in adjacency_list[vertex]:
+                in_degree[neighbour] -= 1
+                if in_degree[neighbour] == 0:
+                    topo_order.append(neighbour)
+        return topo_order
+
     @staticmethod
     def dfs(adjacency_list, vertex, visited, topo_order, topo_group, topo_group_num = 0):
         neighbours = adjacency_list[vertex]
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+
+# Runs every engine over a corpus made by misc/puzzle_creator.py and reports
+# the throughput and tail latencies of Sudoku.solve() per tier. Every answer
+# is checked against the rows, cols and boxes, the givens of the puzzle and
+# the solution recorded in the corpus
+
+sudoku_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+engines = ["ac3", "bitboard", "dlx"]
+tier_order = ["easy", "medium", "hard", "17-clue"]
+
+def load_solver():
+    spec = importlib.util.spec_from_file_location("sudoku_A2_36", os.path.join(sudoku_directory, "sudoku_A2_36.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def is_valid(puzzle, solution, ans):
+    digits = set(range(1, 10))
+    for i in range(9):
+        if set(ans[i]) != digits or set(row[i] for row in ans) != digits:
+            return False
+        if set(ans[i // 3 * 3 + a][i % 3 * 3 + b] for a in range(3) for b in range(3)) != digits:
+            return False
+    cells = "".join(str(value) for row in ans for value in row)
+    if any(given != "0" and given != cell for given, cell in zip(puzzle, cells)):
+        return False
+    return cells == solution
+
+def percentile(values, fraction):
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+def summarize(engine, tier, seconds, valid):
+    seconds = sorted(seconds)
+    return {
+        "engine": engine,
+        "tier": tier,
+        "puzzles": len(seconds),
+        "puzzles_per_second": len(seconds) / max(sum(seconds), 1e-9),
+        "mean_ms": 1000 * sum(seconds) / len(seconds),
+        "p50_ms": 1000 * percentile(seconds, 0.5),
+        "p90_ms": 1000 * percentile(seconds, 0.9),
+        "p99_ms": 1000 * percentile(seconds, 0.99),
+        "max_ms": 1000 * seconds[-1],
+        "valid": valid
+    }
+
+def print_table(rows, previous):
+    previous_rows = dict()
+    for row in previous:
+        previous_rows[(row["engine"], row["tier"])] = row
+
+    header = "%-9s %-8s %7s %10s %9s %9s %9s %9s %9s %8s" % (
+        "engine", "tier", "puzzles", "puzzles/s", "mean ms", "p50 ms", "p90 ms", "p99 ms", "max ms", "valid")
+    if previous:
+        header += " %8s" % "speedup"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        line = "%-9s %-8s %7d %10.1f %9.2f %9.2f %9.2f %9.2f %9.2f %8s" % (
+            row["engine"], row["tier"], row["puzzles"], row["puzzles_per_second"], row["mean_ms"], row["p50_ms"],
+            row["p90_ms"], row["p99_ms"], row["max_ms"], "%d/%d" % (row["valid"], row["puzzles"]))
+        before = previous_rows.get((row["engine"], row["tier"]))
+        if before is not None:
+            line += " %8.2f" % (before["mean_ms"] / max(row["mean_ms"], 1e-9))
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmarks the Sudoku engines")
+    parser.add_argument("corpus", help = "puzzles created by misc/puzzle_creator.py")
+    parser.add_argument("--engines", nargs = "+", choices = engines, default = engines)
+    parser.add_argument("--repeat", type = int, default = 1, help = "times every puzzle is solved")
+    parser.add_argument("--save", metavar = "PATH", help = "write the table rows as JSON")
+    parser.add_argument("--compare", metavar = "PATH", help = "rows saved by an earlier run to show speedups against")
+    args = parser.parse_args()
+
+    with open(args.corpus, "r") as f:
+        corpus = json.load(f)
+    previous = list()
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)
+
+    module = load_solver()
+    tiers = [tier for tier in tier_order if any(entry["tier"] == tier for entry in corpus)]
+    tiers += sorted(set(entry["tier"] for entry in corpus) - set(tiers))
+
+    rows = list()
+    all_valid = True
+    for engine in args.engines:
+        # Tables shared between instances are built before the clock starts
+        module.Sudoku(module.readBoard(corpus[0]["puzzle"])[1], engine = engine).solve()
+        for tier in tiers:
+            seconds = list()
+            valid = 0
+            for entry in corpus:
+                if entry["tier"] != tier:
+                    continue
+                puzzle = module.readBoard(entry["puzzle"])[1]
+                for _ in range(args.repeat):
+                    sudoku = module.Sudoku(puzzle, engine = engine)
+                    start = time.perf_counter()
+                    ans = sudoku.solve()
+                    seconds.append(time.perf_counter() - start)
+                    if is_valid(entry["puzzle"], entry["solution"], ans):
+                        valid += 1
+                    else:
+                        all_valid = False
+                        print("WRONG ANSWER: %s puzzle %d" % (engine, entry["index"]))
+            rows.append(summarize(engine, tier, seconds, valid))
+
+    print_table(rows, previous)
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(rows, f, indent = 4)
+    if not all_valid:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import random
+import argparse
+import importlib.util
+
+# Times the Sudoku engines on generated 9 x 9, 16 x 16 and 25 x 25 puzzles.
+# Puzzles are made by shuffling a patterned solution and blanking cells at
+# random, so they are solvable but may have more than one solution. Every
+# answer is checked against the rules and the givens
+
+sudoku_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+engines = ["bitboard", "dlx", "ac3"]
+
+def load_solver():
+    spec = importlib.util.spec_from_file_location("sudoku_A2_36", os.path.join(sudoku_directory, "sudoku_A2_36.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_puzzle(box_size, blank_ratio, rng):
+    n = box_size
+    size = n * n
+    rows = [band * n + row for band in rng.sample(range(n), n) for row in rng.sample(range(n), n)]
+    cols = [stack * n + col for stack in rng.sample(range(n), n) for col in rng.sample(range(n), n)]
+    values = rng.sample(range(1, size + 1), size)
+    solution = [[values[(n * (x % n) + int(x / n) + y) % size] for y in cols] for x in rows]
+    cells = rng.sample(range(size * size), int(blank_ratio * size * size))
+    puzzle = [list(row) for row in solution]
+    for cell in cells:
+        puzzle[int(cell / size)][cell % size] = 0
+    return puzzle
+
+def is_valid(puzzle, ans):
+    size = len(puzzle)
+    n = int(round(size ** 0.5))
+    full = set(range(1, size + 1))
+    for i in range(size):
+        if set(ans[i]) != full or set(row[i] for row in ans) != full:
+            return False
+        if set(ans[int(i / n) * n + a][i % n * n + b] for a in range(n) for b in range(n)) != full:
+            return False
+    return all(puzzle[x][y] in (0, ans[x][y]) for x in range(size) for y in range(size))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Times the Sudoku engines on larger boards")
+    parser.add_argument("--box-sizes", nargs = "+", type = int, default = [3, 4, 5])
+    parser.add_argument("--engines", nargs = "+", choices = engines, default = engines)
+    parser.add_argument("--puzzles", type = int, default = 10, help = "puzzles per box size")
+    parser.add_argument("--blank-ratio", type = float, default = 0.5, help = "fraction of cells left empty")
+    parser.add_argument("--seed", type = int, default = 3243)
+    args = parser.parse_args()
+
+    module = load_solver()
+    header = "%-6s %-10s %8s %10s %10s %8s" % ("board", "engine", "puzzles", "mean ms", "max ms", "valid")
+    print(header)
+    print("-" * len(header))
+    all_valid = True
+    for box_size in args.box_sizes:
+        rng = random.Random(args.seed + box_size)
+        puzzles = [make_puzzle(box_size, args.blank_ratio, rng) for _ in range(args.puzzles)]
+        for engine in args.engines:
+            seconds = list()
+            valid = 0
+            for puzzle in puzzles:
+                start = time.perf_counter()
+                ans = module.Sudoku(puzzle, engine = engine, box_size = box_size).solve()
+                seconds.append(time.perf_counter() - start)
+                if is_valid(puzzle, ans):
+                    valid += 1
+                else:
+                    all_valid = False
+            size = box_size * box_size
+            print("%-6s %-10s %8d %10.2f %10.2f %8s" % ("%dx%d" % (size, size), engine, len(puzzles),
+                1000 * sum(seconds) / len(seconds), 1000 * max(seconds), "%d/%d" % (valid, len(puzzles))))
+    if not all_valid:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
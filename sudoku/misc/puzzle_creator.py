@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import random
+import importlib.util
+
+# Creates a corpus of 9 x 9 puzzles with unique solutions, graded by the
+# number of clues. The easy, medium and hard tiers are made by blanking the
+# cells of a shuffled solution one at a time for as long as the solution stays
+# unique, stopping at the clue count of the tier ("hard" goes on until no cell
+# can be blanked). Puzzles with 17 clues are far too rare to find that way, so
+# that tier is embedded. Every puzzle is stored with its solution, which
+# misc/benchmark.py checks the engines against
+
+sudoku_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+tiers = [("easy", 36), ("medium", 30), ("hard", 0)]
+
+# Minimal puzzles from Gordon Royle's collection of 17-clue puzzles
+seventeen_clues = [
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+    "000000010400000000020000000000050604008000300001090000300400200050100000000807000",
+    "000000012000035000000600070700000300000400800100000000000120000080000040050000600",
+    "000000012003600000000007000410020000000500300700000600280000040000300500000000000",
+    "000000012008030000000000040120500000000004700060000000507000300000620000000100000",
+    "000000012040050000000009000070600400000100000000000050000087500601000300200000000",
+    "000000012050400000000000030700600400001000000000080000920000800000510700000003000",
+    "000000012300000060000040000900000500000001070020000000000350400001400800060000000"
+]
+
+def load_solver():
+    spec = importlib.util.spec_from_file_location("sudoku_A2_36", os.path.join(sudoku_directory, "sudoku_A2_36.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# A solution from the standard pattern with its digits relabelled, its rows
+# and cols shuffled within bands and stacks, its bands and stacks shuffled and
+# possibly transposed
+def make_solution():
+    rows = [band * 3 + row for band in random.sample(range(3), 3) for row in random.sample(range(3), 3)]
+    cols = [stack * 3 + col for stack in random.sample(range(3), 3) for col in random.sample(range(3), 3)]
+    values = random.sample(range(1, 10), 9)
+    solution = [[values[(3 * (x % 3) + x // 3 + y) % 9] for y in cols] for x in rows]
+    if random.random() < 0.5:
+        solution = [list(col) for col in zip(*solution)]
+    return "".join(str(value) for row in solution for value in row)
+
+def make_puzzle(module, solution, clues):
+    puzzle = list(solution)
+    for cell in random.sample(range(81), 81):
+        if 81 - puzzle.count("0") <= clues:
+            break
+        value, puzzle[cell] = puzzle[cell], "0"
+        if module.countSolutions("".join(puzzle)) != 1:
+            puzzle[cell] = value
+    return "".join(puzzle)
+
+def main(puzzles_per_tier, filename, seed):
+    random.seed(seed)
+    module = load_solver()
+
+    output = list()
+    for tier, clues in tiers:
+        for _ in range(puzzles_per_tier):
+            solution = make_solution()
+            output.append({"tier": tier, "puzzle": make_puzzle(module, solution, clues), "solution": solution})
+    for puzzle in seventeen_clues:
+        output.append({"tier": "17-clue", "puzzle": puzzle, "solution": module.formatBoard(module.solveSudoku(puzzle, "dlx"))})
+
+    for index, entry in enumerate(output):
+        entry["index"] = index + 1
+        entry["clues"] = 81 - entry["puzzle"].count("0")
+
+    with open(filename, "w") as f:
+        json.dump(output, f, indent = 4)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [3, 4]:
+        print("\nUsage: python3 misc/puzzle_creator.py puzzles_per_tier corpus.json [seed]\n")
+        raise ValueError("Wrong number of arguments!")
+    print("CREATING PUZZLES")
+    main(int(sys.argv[1]), sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else 3243)
+    print("FINISHED")
@@ -1,54 +1,574 @@
 import sys
 import copy
-from Queue import Queue
+import json
+import argparse
+import multiprocessing
+from itertools import islice
+from time import perf_counter
+from collections import deque
 
+# A board has box_size ** 2 rows, cols and boxes, each holding the values 1 to
+# box_size ** 2 once. A standard Sudoku has box_size 3. Everything but the
+# domains is only read, so it is built once per box size and shared
 class CSP(object):
-    def __init__(self):
-        self.variables = [(x, y) for x in xrange(9) for y in xrange(9)]
+    tables = dict()                             # box_size -> (variables, constraints, rows, cols, boxes)
+
+    def __init__(self, box_size = 3):
+        if box_size not in CSP.tables:
+            CSP.tables[box_size] = CSP.buildTables(box_size)
+        self.variables, self.constraints, self.rows, self.cols, self.boxes = CSP.tables[box_size]
+        self.units = self.rows + self.cols + self.boxes
+
+        size = box_size * box_size
+        self.box_size = box_size
+        self.size = size
         self.domains = dict()
-        for x in xrange(9):
-             for y in xrange(9):
-                 self.domains[(x,y)] = set(range(1,10))
+        for x in range(size):
+             for y in range(size):
+                 self.domains[(x,y)] = set(range(1, size + 1))
+
+    @staticmethod
+    def buildTables(box_size):
+        n = box_size
+        size = n * n
+        variables = [(x, y) for x in range(size) for y in range(size)]
                  
-        self.constraints = dict()
-        for x in xrange(9):
-            for y in xrange(9):
-                self.constraints[(x, y)] = set()
-                self.constraints[(x, y)].update(set((a, y) for a in xrange(9)))
-                self.constraints[(x, y)].update(set((x, b) for b in xrange(9)))
-                self.constraints[(x, y)].update(set((int(x / 3) * 3 + a, int(y / 3) * 3 + b) for a in xrange(3) for b in xrange(3)))
-                self.constraints[(x, y)].discard((x, y))
+        constraints = dict()
+        for x in range(size):
+            for y in range(size):
+                constraints[(x, y)] = set()
+                constraints[(x, y)].update(set((a, y) for a in range(size)))
+                constraints[(x, y)].update(set((x, b) for b in range(size)))
+                constraints[(x, y)].update(set((int(x / n) * n + a, int(y / n) * n + b) for a in range(n) for b in range(n)))
+                constraints[(x, y)].discard((x, y))
+
+        rows = [[(x, y) for y in range(size)] for x in range(size)]
+        cols = [[(x, y) for x in range(size)] for y in range(size)]
+        boxes = [[(int(box / n) * n + a, box % n * n + b) for a in range(n) for b in range(n)] for box in range(size)]
+        return variables, constraints, rows, cols, boxes
+
+    def boxOf(self, cell):
+        return int(cell[0] / self.box_size) * self.box_size + int(cell[1] / self.box_size)
+
+# Number of set bits of every mask, counted the first time it is asked for
+class BitCounts(dict):
+    def __missing__(self, mask):
+        count = bin(mask).count("1")
+        self[mask] = count
+        return count
+
+# Alternative to CSP where cell (x, y) is index x * size + y of flat arrays and
+# every domain is a size-bit mask, bit v - 1 being set while v is possible.
+# The digits not yet placed in every row, col and box are kept as masks too.
+# Every change is pushed onto a trail, so backtracking pops the trail back to a
+# mark instead of copying every domain on every branch
+class BitboardCSP(object):
+    tables = dict()                             # box_size -> (peers, units, unit_cells, bit_counts)
+
+    def __init__(self, puzzle, box_size = 3, stats = None):
+        if box_size not in BitboardCSP.tables:
+            BitboardCSP.tables[box_size] = BitboardCSP.buildTables(box_size)
+        self.peers, self.units, self.unit_cells, self.bit_counts = BitboardCSP.tables[box_size]
+
+        size = box_size * box_size
+        full = (1 << size) - 1
+        self.size = size
+        self.full = full
+        self.values = [0] * (size * size)       # bit of the assigned value, 0 if unassigned
+        self.domains = [full] * (size * size)
+        self.row_free = [full] * size
+        self.col_free = [full] * size
+        self.box_free = [full] * size
+        self.trail = list()
+        self.stats = stats
+
+        self.consistent = True
+        for x in range(size):
+            for y in range(size):
+                if puzzle[x][y] != 0 and self.consistent:
+                    self.consistent = self.assign(x * size + y, 1 << (puzzle[x][y] - 1))
+
+    # Peers and (row, col, box) of every cell and the cells of every unit,
+    # shared by all instances with the same box size
+    @staticmethod
+    def buildTables(box_size):
+        csp = CSP(box_size)
+        units = list()
+        peers = list()
+        for cell in csp.variables:
+            units.append((cell[0], cell[1], csp.boxOf(cell)))
+            peers.append(sorted(a * csp.size + b for a, b in csp.constraints[cell]))
+        unit_cells = [[a * csp.size + b for a, b in unit] for unit in csp.units]
+        return peers, units, unit_cells, BitCounts()
+
+    def set(self, array, index, value):
+        self.trail.append((array, index, array[index]))
+        array[index] = value
+
+    def undo(self, mark):
+        trail = self.trail
+        while len(trail) > mark:
+            array, index, value = trail.pop()
+            array[index] = value
+
+    # Assigns the value with the given bit to cell and removes it from every
+    # peer. Peers left with a single value are assigned in turn. Returns False
+    # as soon as a domain is emptied or a value would appear twice in a unit
+    def assign(self, cell, bit):
+        pending = [(cell, bit)]
+        while pending:
+            cell, bit = pending.pop()
+            if self.values[cell]:
+                if self.values[cell] != bit:
+                    return False
+                continue
+
+            row, col, box = self.units[cell]
+            if not (self.domains[cell] & self.row_free[row] & self.col_free[col] & self.box_free[box] & bit):
+                return False
+            self.set(self.values, cell, bit)
+            self.set(self.domains, cell, bit)
+            self.set(self.row_free, row, self.row_free[row] & ~bit)
+            self.set(self.col_free, col, self.col_free[col] & ~bit)
+            self.set(self.box_free, box, self.box_free[box] & ~bit)
+
+            for peer in self.peers[cell]:
+                domain = self.domains[peer]
+                if domain & bit:
+                    domain &= ~bit
+                    if not domain:
+                        return False
+                    self.set(self.domains, peer, domain)
+                    if self.bit_counts[domain] == 1:
+                        pending.append((peer, domain))
+        return True
+
+    # Assigns every value that fits only one cell of a unit, until there are
+    # none left. Values seen once and more than once in a unit are collected
+    # as masks, so a unit is scanned once per round
+    def hiddenSingles(self):
+        changed = True
+        while changed:
+            changed = False
+            for unit in self.unit_cells:
+                once, twice, placed = 0, 0, 0
+                for cell in unit:
+                    domain = self.domains[cell]
+                    twice |= once & domain
+                    once |= domain
+                    placed |= self.values[cell]
+                if once != self.full:
+                    return False
+
+                singles = once & ~twice & ~placed
+                while singles:
+                    bit = singles & -singles
+                    singles &= singles - 1
+                    cells = [cell for cell in unit if self.domains[cell] & bit]
+                    if not cells or not self.assign(cells[0], bit):
+                        return False
+                    changed = True
+        return True
+
+    # Branches on the unassigned cell with the fewest values left
+    def backtrackSearch(self, depth = 1):
+        if not self.hiddenSingles():
+            return False
+
+        cell, cell_count = -1, self.size + 1
+        for candidate in range(len(self.values)):
+            if not self.values[candidate]:
+                count = self.bit_counts[self.domains[candidate]]
+                if count < cell_count:
+                    cell, cell_count = candidate, count
+                    if count == 2:
+                        break
+        if cell < 0:
+            return True
+
+        if self.stats is not None:
+            self.stats.max_depth = max(self.stats.max_depth, depth)
+        domain = self.domains[cell]
+        while domain:
+            bit = domain & -domain
+            domain &= domain - 1
+            mark = len(self.trail)
+            if self.stats is not None:
+                self.stats.guesses += 1
+            if self.assign(cell, bit) and self.backtrackSearch(depth + 1):
+                return True
+            self.undo(mark)
+            if self.stats is not None:
+                self.stats.backtracks += 1
+        return False
+
+# Knuth's Algorithm X on a sparse 0/1 matrix kept as dancing links. Node 0 is
+# the root, nodes 1 to column_count are the column headers and every 1 of the
+# matrix is a node linked to its neighbours in the same row and column.
+# Covering a column unlinks it with every row that has a 1 in it, and
+# uncovering relinks them in the reverse order
+class DancingLinks(object):
+    def __init__(self, column_count):
+        headers = range(column_count + 1)
+        self.left = [column - 1 for column in headers]
+        self.right = [column + 1 for column in headers]
+        self.left[0] = column_count
+        self.right[column_count] = 0
+        self.up = list(headers)
+        self.down = list(headers)
+        self.column = list(headers)
+        self.row = [-1] * (column_count + 1)
+        self.sizes = [0] * (column_count + 1)
+
+    def addRow(self, row, columns):
+        first = len(self.column)
+        for offset, column in enumerate(columns):
+            node = first + offset
+            self.left.append(node - 1 if offset else first + len(columns) - 1)
+            self.right.append(node + 1 if offset < len(columns) - 1 else first)
+            self.up.append(self.up[column])
+            self.down.append(column)
+            self.down[self.up[column]] = node
+            self.up[column] = node
+            self.column.append(column)
+            self.row.append(row)
+            self.sizes[column] += 1
+
+    def cover(self, column):
+        left, right, up, down = self.left, self.right, self.up, self.down
+        right[left[column]] = right[column]
+        left[right[column]] = left[column]
+        i = down[column]
+        while i != column:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                self.sizes[self.column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, column):
+        left, right, up, down = self.left, self.right, self.up, self.down
+        i = up[column]
+        while i != column:
+            j = left[i]
+            while j != i:
+                self.sizes[self.column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[column]] = column
+        left[right[column]] = column
+
+    # Counts the exact covers, stopping once limit of them are found, and
+    # returns the count with the rows of the first cover
+    def search(self, limit = 1):
+        self.count = 0
+        self.solution = None
+        self.searchHelper(list(), limit)
+        return self.count, self.solution
+
+    def searchHelper(self, rows, limit):
+        right, down = self.right, self.down
+        if right[0] == 0:
+            self.count += 1
+            if self.solution is None:
+                self.solution = list(rows)
+            return self.count >= limit
+
+        # Branch on the column with the fewest rows left
+        column, column_size = 0, -1
+        candidate = right[0]
+        while candidate != 0:
+            if column_size < 0 or self.sizes[candidate] < column_size:
+                column, column_size = candidate, self.sizes[candidate]
+                if column_size < 2:
+                    break
+            candidate = right[candidate]
+
+        self.cover(column)
+        i = down[column]
+        while i != column:
+            rows.append(self.row[i])
+            j = right[i]
+            while j != i:
+                self.cover(self.column[j])
+                j = right[j]
+            done = self.searchHelper(rows, limit)
+            j = self.left[i]
+            while j != i:
+                self.uncover(self.column[j])
+                j = self.left[j]
+            rows.pop()
+            if done:
+                self.uncover(column)
+                return True
+            i = down[i]
+        self.uncover(column)
+        return False
+
+# Work done by one solve, or by many once added together. Only the ac3
+# engine counts arcs, pruned values and propagation time, dlx only times
+class SolveStats(object):
+    def __init__(self, engine):
+        self.engine = engine
+        self.puzzles = 0
+        self.max_depth = 0                      # deepest branch of the search
+        self.guesses = 0                        # values tried on cells with more than one value
+        self.backtracks = 0                     # guesses undone
+        self.arcs = 0                           # arcs taken off the AC3 queue
+        self.pruned = 0                         # values removed by revise
+        self.narrowed = dict()                  # domains narrowed by each unit rule
+        self.total_seconds = 0.0
+        self.propagation_seconds = 0.0
+
+    def add(self, other):
+        self.puzzles += other.puzzles
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.guesses += other.guesses
+        self.backtracks += other.backtracks
+        self.arcs += other.arcs
+        self.pruned += other.pruned
+        for technique, narrowed in other.narrowed.items():
+            self.narrowed[technique] = self.narrowed.get(technique, 0) + narrowed
+        self.total_seconds += other.total_seconds
+        self.propagation_seconds += other.propagation_seconds
+
+    @staticmethod
+    def fromDict(values):
+        stats = SolveStats(values["engine"])
+        stats.puzzles = values["puzzles"]
+        stats.max_depth = values["max_depth"]
+        stats.guesses = values["guesses"]
+        stats.backtracks = values["backtracks"]
+        stats.arcs = values["arcs_processed"]
+        stats.pruned = values["values_pruned"]
+        stats.narrowed = dict(values["narrowed"])
+        stats.total_seconds = values["seconds"]["total"]
+        stats.propagation_seconds = values["seconds"]["propagation"]
+        return stats
+
+    def asDict(self):
+        return {
+            "engine": self.engine,
+            "puzzles": self.puzzles,
+            "max_depth": self.max_depth,
+            "guesses": self.guesses,
+            "backtracks": self.backtracks,
+            "arcs_processed": self.arcs,
+            "values_pruned": self.pruned,
+            "narrowed": self.narrowed,
+            "seconds": {
+                "total": self.total_seconds,
+                "propagation": self.propagation_seconds,
+                "search": max(self.total_seconds - self.propagation_seconds, 0.0)
+            }
+        }
 
 class Sudoku(object):
-    def __init__(self, puzzle):
+    all_techniques = ("hidden_singles", "naked_pairs", "hidden_pairs", "box_line")
+
+    def __init__(self, puzzle, engine = "ac3", techniques = all_techniques, box_size = 3, tie_break = None,
+            collect_stats = False):
         # you may add more attributes if you need
         self.puzzle = puzzle                    # self.puzzle is a list of lists
         self.ans = copy.deepcopy(puzzle)        # self.ans is a list of lists
-        self.csp = CSP()
+        self.solved = False                     # whether self.ans holds a solution
+        self.csp = CSP(box_size)
+        self.box_size = box_size
+        self.size = box_size * box_size
+        self.engine = engine                    # "ac3", "bitboard" or "dlx"
+
+        # Unit rules run by propagate after AC3, in this order
+        propagators = {
+            "hidden_singles": self.hiddenSingles,
+            "naked_pairs": self.nakedPairs,
+            "hidden_pairs": self.hiddenPairs,
+            "box_line": self.boxLine
+        }
+        self.techniques = [(technique, propagators[technique]) for technique in techniques]
+        self.narrowed = dict((technique, 0) for technique in techniques)
+        self.guesses = 0                        # values tried on cells with more than one value
+
+        # buckets[k] holds the cells with k values left, so the search finds
+        # the smallest domain without sorting. Every domain change goes
+        # through setDomain, which moves the cell between buckets and pushes
+        # the old domain onto the trail that undo pops on backtracking
+        self.buckets = [set() for size in range(self.size + 1)]
+        self.buckets[self.size].update(self.csp.variables)
+        self.trail = list()
+        self.tie_break = tie_break              # None or "degree"
+
+        # collect_stats = True fills self.stats while solving
+        self.stats = SolveStats(engine) if collect_stats else None
 
     def readPuzzle(self):
-        queue = Queue()
-        for x in xrange(9):
-            for y in xrange(9):
+        queue = deque()
+        for x in range(self.size):
+            for y in range(self.size):
                 if self.puzzle[x][y] != 0:
                     target_cell = (x, y)
-                    self.csp.domains[target_cell] = set([self.puzzle[x][y]])
+                    self.setDomain(target_cell, set([self.puzzle[x][y]]))
                     for neighbour in self.csp.constraints[target_cell]:
-                        queue.put((neighbour, target_cell))
+                        queue.append((neighbour, target_cell))
 
         return queue
 
-    def AC3(self, queue = Queue()):
+    def AC3(self, queue):
         # Make cell_i consistent with cell_j
-        while not queue.empty():
-            cell_i, cell_j = queue.get()
+        arcs = len(queue)
+        while queue:
+            cell_i, cell_j = queue.popleft()
             if self.revise(cell_i, cell_j):
                 if len(self.csp.domains[cell_i]) == 0:
+                    if self.stats is not None:
+                        self.stats.arcs += arcs - len(queue)
                     return False
+                arcs += len(self.csp.constraints[cell_i])
                 for cell_i_neighbour in self.csp.constraints[cell_i]:
-                    queue.put((cell_i_neighbour, cell_i))
+                    queue.append((cell_i_neighbour, cell_i))
+        if self.stats is not None:
+            self.stats.arcs += arcs
         return True
 
+    # Runs AC3 and the unit rules until none of them narrows a domain. AC3 runs
+    # again whenever a rule narrows something, so the cheap arc revisions are
+    # always done before the next rule is tried
+    def propagate(self, queue):
+        if self.stats is None:
+            return self.propagateHelper(queue)
+        start = perf_counter()
+        result = self.propagateHelper(queue)
+        self.stats.propagation_seconds += perf_counter() - start
+        return result
+
+    def propagateHelper(self, queue):
+        while True:
+            if not self.AC3(queue):
+                return False
+            for technique, propagator in self.techniques:
+                narrowed = propagator(queue)
+                if narrowed is None:
+                    return False
+                if narrowed:
+                    self.narrowed[technique] += narrowed
+                    break
+            else:
+                return True
+
+    # Replaces the domain of cell and queues the arcs of its peers if only one
+    # value is left. Returns the number of domains narrowed (0 or 1), or None
+    # if the domain would become empty
+    def narrow(self, cell, domain, queue):
+        if domain == self.csp.domains[cell]:
+            return 0
+        if not domain:
+            return None
+        self.setDomain(cell, domain)
+        if len(domain) == 1:
+            for neighbour in self.csp.constraints[cell]:
+                queue.append((neighbour, cell))
+        return 1
+
+    # Cells in unit that can still take each value
+    def places(self, unit):
+        value_places = dict((value, list()) for value in range(1, self.size + 1))
+        for cell in unit:
+            for value in self.csp.domains[cell]:
+                value_places[value].append(cell)
+        return value_places
+
+    # A value that fits only one cell of a unit goes there
+    def hiddenSingles(self, queue):
+        narrowed = 0
+        for unit in self.csp.units:
+            for value, cells in self.places(unit).items():
+                if not cells:
+                    return None
+                if len(cells) == 1:
+                    result = self.narrow(cells[0], set([value]), queue)
+                    if result is None:
+                        return None
+                    narrowed += result
+        return narrowed
+
+    # Two cells of a unit left with the same two values take both of them, so
+    # the rest of the unit cannot
+    def nakedPairs(self, queue):
+        narrowed = 0
+        for unit in self.csp.units:
+            pair_cells = dict()
+            for cell in unit:
+                if len(self.csp.domains[cell]) == 2:
+                    pair_cells.setdefault(frozenset(self.csp.domains[cell]), []).append(cell)
+            for pair, cells in pair_cells.items():
+                if len(cells) > 2:
+                    return None
+                if len(cells) < 2:
+                    continue
+                for cell in unit:
+                    if cell not in cells:
+                        result = self.narrow(cell, self.csp.domains[cell] - pair, queue)
+                        if result is None:
+                            return None
+                        narrowed += result
+        return narrowed
+
+    # Two values that fit only the same two cells of a unit take both cells,
+    # so those cells cannot hold anything else
+    def hiddenPairs(self, queue):
+        narrowed = 0
+        for unit in self.csp.units:
+            value_places = self.places(unit)
+            pair_values = dict()
+            for value, cells in value_places.items():
+                if len(cells) == 2:
+                    pair_values.setdefault(tuple(cells), []).append(value)
+            for cells, values in pair_values.items():
+                if len(values) > 2:
+                    return None
+                if len(values) < 2:
+                    continue
+                for cell in cells:
+                    result = self.narrow(cell, self.csp.domains[cell] & set(values), queue)
+                    if result is None:
+                        return None
+                    narrowed += result
+        return narrowed
+
+    # A value that fits a box only along one row or col is removed from the
+    # rest of that line (pointing), and a value that fits a row or col only
+    # inside one box is removed from the rest of that box (claiming)
+    def boxLine(self, queue):
+        narrowed = 0
+        for box in self.csp.boxes:
+            for value, cells in self.places(box).items():
+                if not cells:
+                    continue
+                for line in (self.csp.rows[cells[0][0]], self.csp.cols[cells[0][1]]):
+                    if all(cell in line for cell in cells):
+                        for cell in line:
+                            if cell not in box:
+                                result = self.narrow(cell, self.csp.domains[cell] - set([value]), queue)
+                                if result is None:
+                                    return None
+                                narrowed += result
+        for line in self.csp.rows + self.csp.cols:
+            for value, cells in self.places(line).items():
+                if not cells:
+                    continue
+                box = self.csp.boxes[self.csp.boxOf(cells[0])]
+                if all(cell in box for cell in cells):
+                    for cell in box:
+                        if cell not in line:
+                            result = self.narrow(cell, self.csp.domains[cell] - set([value]), queue)
+                            if result is None:
+                                return None
+                            narrowed += result
+        return narrowed
+
     def revise(self, cell_i, cell_j):
         revised = False
         rejected_values = set()
@@ -59,85 +579,318 @@ class Sudoku(object):
                 rejected_values.add(value)
                 revised = True
 
-        self.csp.domains[cell_i] = self.csp.domains[cell_i] - rejected_values
+        if revised:
+            self.setDomain(cell_i, self.csp.domains[cell_i] - rejected_values)
+            if self.stats is not None:
+                self.stats.pruned += len(rejected_values)
         return revised
 
-    def backtrackSearch(self):
-        unconfirmed_cells = list()
-        for cell, domain in self.csp.domains.items():
-            if len(domain) > 1:
-                unconfirmed_cells.append(cell)
+    def setDomain(self, cell, domain):
+        old_domain = self.csp.domains[cell]
+        self.trail.append((cell, old_domain))
+        self.buckets[len(old_domain)].discard(cell)
+        self.buckets[len(domain)].add(cell)
+        self.csp.domains[cell] = domain
 
-        if self.backtrackSearchHelper(unconfirmed_cells):
+    def undo(self, mark):
+        while len(self.trail) > mark:
+            cell, domain = self.trail.pop()
+            self.buckets[len(self.csp.domains[cell])].discard(cell)
+            self.buckets[len(domain)].add(cell)
+            self.csp.domains[cell] = domain
+
+    # Unassigned cells with the fewest values left, either the first of them
+    # or, for the "degree" tie break, the one constraining the most other
+    # unassigned cells. Cells with one value left were already propagated by
+    # AC3, so they are never branched on. None once every cell has one value.
+    # Guess counts swing widely with the tie order, most of all when only one
+    # unit rule runs, so compare them with misc/techniques.py when changing it
+    def selectCell(self):
+        for size in range(2, self.size + 1):
+            bucket = self.buckets[size]
+            if bucket:
+                if self.tie_break == "degree":
+                    return max(sorted(bucket), key = self.degree)
+                return min(bucket)
+        return None
+
+    def degree(self, cell):
+        return sum(1 for neighbour in self.csp.constraints[cell] if len(self.csp.domains[neighbour]) > 1)
+
+    def backtrackSearch(self):
+        del self.trail[:]
+        if self.backtrackSearchHelper():
+            self.solved = True
             for cell in self.csp.variables:
                 self.ans[cell[0]][cell[1]] = self.csp.domains[cell].pop()
 
-    def backtrackSearchHelper(self, unconfirmed_cells):
-        if not unconfirmed_cells:
+    def backtrackSearchHelper(self, depth = 1):
+        cell = self.selectCell()
+        if cell is None:
             return True
-        
-        unconfirmed_cells.sort(key = lambda cell: len(self.csp.domains[cell]), reverse = True)
-        cell = unconfirmed_cells.pop()
-
-        copied_domains = copy.deepcopy(self.csp.domains)
-        cell_domain = self.csp.domains[cell]
 
-        for value in cell_domain:
-            self.csp.domains[cell] = set([value])
-            affected_arcs = Queue()
+        if self.stats is not None:
+            self.stats.max_depth = max(self.stats.max_depth, depth)
+        mark = len(self.trail)
+        for value in sorted(self.csp.domains[cell]):
+            self.guesses += 1
+            self.setDomain(cell, set([value]))
+            affected_arcs = deque()
             
             for neighbour in self.csp.constraints[cell]:
-                affected_arcs.put((neighbour, cell))
+                affected_arcs.append((neighbour, cell))
 
-            if self.AC3(affected_arcs):
-                result = self.backtrackSearchHelper(unconfirmed_cells)
+            if self.propagate(affected_arcs):
+                result = self.backtrackSearchHelper(depth + 1)
                 if result:
                     return True
-            self.csp.domains = copied_domains
-        unconfirmed_cells.append(cell)
+            self.undo(mark)
+            if self.stats is not None:
+                self.stats.backtracks += 1
         return False
 
+    def bitboardSolve(self):
+        bitboard = BitboardCSP(self.puzzle, self.box_size, self.stats)
+        if bitboard.consistent and bitboard.backtrackSearch():
+            self.solved = True
+            for cell in range(self.size * self.size):
+                self.ans[int(cell / self.size)][cell % self.size] = bitboard.values[cell].bit_length()
+        return self.ans
+
+    # Exact cover matrix of the CSP: a row for every value left in the domain
+    # of every cell, with a 1 in the column of the cell and in the column of
+    # the value in each of the cell's row, col and box
+    def exactCover(self):
+        self.readPuzzle()
+        cell_count = len(self.csp.variables)
+        unit_indices = dict((cell, list()) for cell in self.csp.variables)
+        for unit_index, unit in enumerate(self.csp.units):
+            for cell in unit:
+                unit_indices[cell].append(unit_index)
+
+        # Columns 1 to cell_count are the cells, then every unit has one
+        # column per value
+        matrix = DancingLinks(cell_count + len(self.csp.units) * self.size)
+        for cell_index, cell in enumerate(self.csp.variables):
+            for value in sorted(self.csp.domains[cell]):
+                columns = [cell_index + 1] + [cell_count + unit_index * self.size + value for unit_index in unit_indices[cell]]
+                matrix.addRow((cell, value), columns)
+        return matrix
+
+    def dlxSolve(self):
+        count, rows = self.exactCover().search()
+        if count:
+            self.solved = True
+            for cell, value in rows:
+                self.ans[cell[0]][cell[1]] = value
+        return self.ans
+
+    # Number of solutions, counting stops at limit. A limit of 2 tells
+    # whether the solution is unique
+    def countSolutions(self, limit = 2):
+        count, rows = self.exactCover().search(limit)
+        return count
+
+    # Returns self.ans, which is a solution only if self.solved is True
+    # afterwards. A board without a solution is returned unchanged
     def solve(self):
         #TODO: Your code here
+        if self.stats is None:
+            return self.solveHelper()
+
+        start = perf_counter()
+        ans = self.solveHelper()
+        self.stats.total_seconds = perf_counter() - start
+        self.stats.puzzles = 1
+        if self.engine == "ac3":
+            self.stats.guesses = self.guesses
+            self.stats.narrowed = dict(self.narrowed)
+        return ans
+
+    def solveHelper(self):
+        if self.engine == "bitboard":
+            return self.bitboardSolve()
+        if self.engine == "dlx":
+            return self.dlxSolve()
+
         initial_queue = self.readPuzzle()
-        self.AC3(initial_queue)
-        self.backtrackSearch()
+        if self.propagate(initial_queue):
+            self.backtrackSearch()
 
         return self.ans
 
     # you may add more classes/functions if you think is useful
     # However, ensure all the classes/functions are in this file ONLY
 
+# Symbols of the values 1 to 35 in boards written as strings
+symbols = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Reads a board of 81, 256 or 625 cells given as a string, as a flat sequence
+# of numbers or as a list of rows, and returns its box size and rows.
+# A string with one whitespace separated number per cell, like the rows of an
+# input file, is read as numbers. Any other string is read one symbol per
+# cell, '0' or '.' being an empty cell and letters standing for 10 and above
+# ('A' is 10, 'G' is 16, 'P' is 25). Characters that are not symbols are
+# ignored, so an 81 character line or a grid drawn with separators both work
+def readBoard(board):
+    if isinstance(board, str):
+        tokens = board.split()
+        if boxSizeOf(len(tokens)) and all(token.isdigit() for token in tokens):
+            cells = [int(token) for token in tokens]
+        else:
+            cells = [0 if char == '.' else symbols.index(char) + 1 if char != '0' else 0
+                for char in board.upper() if char == '.' or char == '0' or char in symbols]
+    elif len(board) and not isinstance(board[0], (int, str)):
+        cells = [int(number) for row in board for number in row]
+    else:
+        cells = [int(number) for number in board]
+
+    box_size = boxSizeOf(len(cells))
+    if not box_size:
+        raise ValueError("A board needs 81, 256 or 625 cells, got %d" % len(cells))
+    size = box_size * box_size
+    if any(not 0 <= number <= size for number in cells):
+        raise ValueError("A board with %d cells holds 0 to %d" % (len(cells), size))
+    return box_size, [cells[x * size:x * size + size] for x in range(size)]
+
+def boxSizeOf(cell_count):
+    for box_size in (3, 4, 5):
+        if box_size ** 4 == cell_count:
+            return box_size
+    return 0
+
+# Writes rows as a string of one symbol per cell, '0' for empty cells
+def formatBoard(rows):
+    return "".join(symbols[number - 1] if number else "0" for row in rows for number in row)
+
+# Solves a board in any format accepted by readBoard and returns the solution
+# as rows of numbers, or None if the board has no solution
+def solveSudoku(board, engine = "ac3"):
+    box_size, puzzle = readBoard(board)
+    sudoku = Sudoku(puzzle, engine = engine, box_size = box_size)
+    ans = sudoku.solve()
+    if not sudoku.solved:
+        return None
+    return ans
+
+# Number of solutions of a board, counting stops at limit
+def countSolutions(board, limit = 2):
+    box_size, puzzle = readBoard(board)
+    return Sudoku(puzzle, box_size = box_size).countSolutions(limit)
+
+batch_settings = dict()
+
+# Yields the puzzles of a file holding one puzzle per line, in any string
+# format accepted by readBoard. Lines are read as they are needed
+def readPuzzles(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield line
+
+# Builds the shared tables of every board size once per worker process, so
+# no puzzle pays for them
+def initBatchWorker(engine, collect_stats):
+    batch_settings.update(engine = engine, collect_stats = collect_stats)
+    for box_size in (3, 4, 5):
+        CSP(box_size)
+        BitboardCSP([[0] * box_size * box_size] * (box_size * box_size), box_size)
+
+# Solves a chunk of puzzles, one answer line per puzzle, along with the stats
+# of the whole chunk when they are collected
+def solveBatchChunk(puzzles):
+    engine = batch_settings["engine"]
+    stats = SolveStats(engine) if batch_settings["collect_stats"] else None
+    answers = list()
+    for puzzle in puzzles:
+        try:
+            box_size, board = readBoard(puzzle)
+        except ValueError:
+            answers.append("invalid")
+            continue
+        sudoku = Sudoku(board, engine = engine, box_size = box_size, collect_stats = stats is not None)
+        ans = sudoku.solve()
+        answers.append(formatBoard(ans) if sudoku.solved else "unsolvable")
+        if stats is not None:
+            stats.add(sudoku.stats)
+    return answers, stats.asDict() if stats is not None else None
+
+# Solves puzzles in worker processes and writes an answer line per puzzle in
+# input order. Puzzles are sent in chunks, and only a few chunks per worker
+# are read ahead, so the input is never read into memory all at once. The
+# stats of every puzzle are added to stats when one is given
+def solveBatch(puzzles, output, engine = "bitboard", workers = None, chunksize = 64, stats = None):
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers, initBatchWorker, (engine, stats is not None))
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = list(islice(puzzles, chunksize))
+                if not chunk:
+                    break
+                pending.append(pool.apply_async(solveBatchChunk, (chunk,)))
+            if not pending:
+                break
+            answers, chunk_stats = pending.popleft().get()
+            for answer in answers:
+                output.write(answer + '\n')
+            output.flush()
+            if stats is not None:
+                stats.add(SolveStats.fromDict(chunk_stats))
+    finally:
+        pool.close()
+        pool.join()
+
 if __name__ == "__main__":
-    # STRICTLY do NOT modify the code in the main function here
-    if len(sys.argv) != 3:
-        print ("\nUsage: python sudoku_A2_xx.py input.txt output.txt\n")
-        raise ValueError("Wrong number of arguments!")
+    parser = argparse.ArgumentParser(description = "Solves Sudoku puzzles")
+    parser.add_argument("input", help = "puzzle, see readBoard for the format")
+    parser.add_argument("output", help = "file the solution is written to")
+    parser.add_argument("--engine", choices = ["ac3", "bitboard", "dlx"], default = None,
+        help = "defaults to ac3, or to bitboard in --batch mode")
+    parser.add_argument("--batch", action = "store_true",
+        help = "input holds one puzzle per line and may be '-' for stdin; one line of symbols is written "
+            "per puzzle in input order, or 'unsolvable' or 'invalid', output may be '-' for stdout")
+    parser.add_argument("--workers", type = int, default = None,
+        help = "worker processes in --batch mode, defaults to the number of cores")
+    parser.add_argument("--chunksize", type = int, default = 64, help = "puzzles sent to a worker at a time in --batch mode")
+    parser.add_argument("--stats", metavar = "PATH",
+        help = "write solve statistics as JSON to PATH, or to stdout for '-'; summed over all puzzles in --batch mode")
+    args = parser.parse_args()
+
+    def writeStats(stats):
+        if args.stats == '-':
+            print(json.dumps(stats.asDict(), indent = 4))
+        elif args.stats is not None:
+            with open(args.stats, 'w') as f:
+                json.dump(stats.asDict(), f, indent = 4)
+
+    if args.batch:
+        puzzles_file = sys.stdin if args.input == '-' else open(args.input, 'r')
+        output_file = sys.stdout if args.output == '-' else open(args.output, 'w')
+        stats = SolveStats(args.engine or "bitboard") if args.stats is not None else None
+        solveBatch(readPuzzles(puzzles_file), output_file, args.engine or "bitboard", args.workers, args.chunksize, stats)
+        if stats is not None:
+            output_file.flush()
+            writeStats(stats)
+        sys.exit(0)
 
     try:
-        f = open(sys.argv[1], 'r')
+        f = open(args.input, 'r')
     except IOError:
         print ("\nUsage: python sudoku_A2_xx.py input.txt output.txt\n")
         raise IOError("Input file not found!")
 
-    puzzle = [[0 for i in range(9)] for j in range(9)]
-    lines = f.readlines()
-
-    i, j = 0, 0
-    for line in lines:
-        for number in line:
-            if '0' <= number <= '9':
-                puzzle[i][j] = int(number)
-                j += 1
-                if j == 9:
-                    i += 1
-                    j = 0
+    # Boards of 16 x 16 and 25 x 25 are read too, see readBoard for the format
+    box_size, puzzle = readBoard(f.read())
 
-    sudoku = Sudoku(puzzle)
+    sudoku = Sudoku(puzzle, engine = args.engine or "ac3", box_size = box_size, collect_stats = args.stats is not None)
     ans = sudoku.solve()
+    if sudoku.stats is not None:
+        writeStats(sudoku.stats)
 
-    with open(sys.argv[2], 'w') as f:
-        for i in range(9):
-            for j in range(9):
+    with open(args.output, 'w') as f:
+        for i in range(len(ans)):
+            for j in range(len(ans)):
                 f.write(str(ans[i][j]) + " ")
-            f.write("\n")
\ No newline at end of file
+            f.write("\n")